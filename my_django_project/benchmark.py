@@ -0,0 +1,330 @@
+"""Compare the book API under WSGI (uwsgi) and ASGI (uvicorn) servers.
+
+Every server configuration is started in turn against the configured database
+(SQLite, or PostgreSQL with ``PRODUCTION`` set), driven with the same
+workloads, then stopped. Throughput, p50/p95/p99 latency, errors and the
+peak RSS of the server process tree are written to ``report.json`` and
+``report.md``::
+
+    python benchmark.py --setup
+    python benchmark.py --servers uwsgi:1x1 uwsgi:4x4 uvicorn:4 --duration 30
+
+``uwsgi:<processes>x<threads>`` and ``uvicorn:<workers>`` name the
+configurations; an ``@close``, ``@persistent`` or ``@pool`` suffix picks how
+PostgreSQL connections are handled (see ``DB_MODES``)::
+
+    PRODUCTION=1 python benchmark.py --servers uwsgi:4x4@close uwsgi:4x4@persistent uwsgi:4x4@pool
+
+The load driver is a pool of keep-alive client threads, and both servers
+keep connections open (uwsgi through ``--http11-socket``). Give the driver a
+core of its own (or another machine, with ``--host``) so that it does not
+compete with the server.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "my_django_project.settings")
+django.setup()
+
+from django.core.management import call_command
+from django.urls import reverse
+
+from my_books.models import Book
+
+BASE_DIR = Path(__file__).resolve().parent
+
+DEFAULT_SERVERS = ["uwsgi:1x1", "uwsgi:4x1", "uwsgi:4x4", "uvicorn:1", "uvicorn:4"]
+
+# connection handling -> server environment, for the PostgreSQL configuration
+DB_MODES = {
+    "close": {"DB_POOL": "false", "DB_CONN_MAX_AGE": "0"},
+    "persistent": {"DB_POOL": "false", "DB_CONN_MAX_AGE": "60"},
+    "pool": {"DB_POOL": "true", "DB_CONN_MAX_AGE": "0"},
+}
+
+# workload name -> (url name, takes a pk, query string)
+WORKLOADS = {
+    "rest-read": ("book-rest-detail", True, ""),
+    "async-read": ("book-async-detail", True, ""),
+    "rest-list": ("book-rest-list", False, "?fields=id,title"),
+    "async-list": ("book-async-list", False, "?fields=id,title"),
+}
+
+
+def server_environment(spec, host):
+    _, _, mode = spec.partition("@")
+
+    if mode and mode not in DB_MODES:
+        raise argparse.ArgumentTypeError(f"Unknown connection mode: {mode}")
+
+    # the driver sends Host: <host>, which Django must accept
+    return {**os.environ, "ALLOWED_HOSTS": host, **DB_MODES.get(mode, {})}
+
+
+def server_command(spec, port):
+    kind, _, size = spec.partition("@")[0].partition(":")
+
+    if kind == "uwsgi":
+        processes, _, threads = size.partition("x")
+        return [
+            "uwsgi",
+            "--master",
+            "--enable-threads",
+            # like uvicorn, keep the driver's connections open between requests
+            "--http11-socket", f":{port}",
+            "--module", "my_django_project.wsgi",
+            "--processes", processes or "1",
+            "--threads", threads or "1",
+            "--disable-logging",
+        ]
+
+    if kind == "uvicorn":
+        return [
+            "uvicorn",
+            "my_django_project.asgi:application",
+            # every interface, like uwsgi's --http11-socket :port
+            "--host", "0.0.0.0",
+            "--port", str(port),
+            "--workers", size or "1",
+            "--no-access-log",
+        ]
+
+    raise argparse.ArgumentTypeError(f"Unknown server: {spec}")
+
+
+def children(pid):
+    """Return ``pid`` and all of its descendants, read from ``/proc``."""
+    parents = {}
+
+    for stat in Path("/proc").glob("[0-9]*/stat"):
+        try:
+            fields = stat.read_text().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+
+        parents.setdefault(int(fields[1]), []).append(int(stat.parent.name))
+
+    tree, pending = [], [pid]
+    while pending:
+        tree.append(current := pending.pop())
+        pending.extend(parents.get(current, []))
+
+    return tree
+
+
+def rss(pid):
+    """Return the resident set size of the process tree under ``pid``, in bytes."""
+    total = 0
+
+    for process in children(pid):
+        try:
+            for line in Path(f"/proc/{process}/status").read_text().splitlines():
+                if line.startswith("VmRSS:"):
+                    total += int(line.split()[1]) * 1024
+        except OSError:
+            continue
+
+    return total
+
+
+def wait_until_up(host, port, timeout):
+    deadline = time.monotonic() + timeout
+
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection(host, port, timeout=1)
+            connection.request("GET", reverse("book-rest-list") + "?page_size=1")
+            connection.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.2)
+
+    raise RuntimeError(f"Server did not answer on {host}:{port} within {timeout}s")
+
+
+def percentile(ordered, fraction):
+    """Return the ``fraction`` percentile of the sorted ``ordered`` seconds, in milliseconds."""
+    if not ordered:
+        return None
+
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1000
+
+
+def drive(host, port, paths, concurrency, duration):
+    """Request random ``paths`` from ``concurrency`` threads for ``duration`` seconds."""
+    latencies, errors, lock = [], [0], threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client():
+        connection = http.client.HTTPConnection(host, port, timeout=30)
+        own, failed = [], 0
+
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+
+            try:
+                connection.request("GET", random.choice(paths))
+                response = connection.getresponse()
+                response.read()
+            except (OSError, http.client.HTTPException):
+                failed += 1
+                connection.close()
+                connection = http.client.HTTPConnection(host, port, timeout=30)
+                continue
+
+            if response.status == 200:
+                own.append(time.perf_counter() - start)
+            else:
+                failed += 1
+
+        with lock:
+            latencies.extend(own)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    start = time.monotonic()
+
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    elapsed = time.monotonic() - start
+    latencies.sort()
+
+    return {
+        "requests": len(latencies),
+        "errors": errors[0],
+        "throughput": len(latencies) / elapsed,
+        **{f"p{int(fraction * 100)}_ms": percentile(latencies, fraction) for fraction in (0.50, 0.95, 0.99)},
+    }
+
+
+def workload_paths(name, pks):
+    url_name, takes_pk, query = WORKLOADS[name]
+
+    if takes_pk:
+        return [reverse(url_name, kwargs={"pk": pk}) + query for pk in pks]
+
+    return [reverse(url_name) + query]
+
+
+def run_server(spec, args, pks):
+    command = server_command(spec, args.port)
+    server = subprocess.Popen(
+        command,
+        cwd=BASE_DIR,
+        env=server_environment(spec, args.host),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    results = []
+
+    try:
+        wait_until_up(args.host, args.port, args.startup_timeout)
+
+        for name in args.workloads:
+            paths = workload_paths(name, pks)
+            drive(args.host, args.port, paths, args.concurrency, args.warmup)
+
+            peak, sampling = [rss(server.pid)], threading.Event()
+
+            def sample():
+                while not sampling.wait(0.5):
+                    peak.append(rss(server.pid))
+
+            sampler = threading.Thread(target=sample)
+            sampler.start()
+
+            try:
+                stats = drive(args.host, args.port, paths, args.concurrency, args.duration)
+            finally:
+                sampling.set()
+                sampler.join()
+
+            results.append({"server": spec, "workload": name, **stats, "rss_mb": max(peak) / 2 ** 20})
+            print(json.dumps(results[-1]), file=sys.stderr)
+    finally:
+        # SIGINT stops the uwsgi master and the uvicorn supervisor with their workers
+        server.send_signal(signal.SIGINT)
+
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+    return results
+
+
+def markdown(results):
+    lines = [
+        "| server | workload | req/s | p50 ms | p95 ms | p99 ms | errors | RSS MB |",
+        "|---|---|---:|---:|---:|---:|---:|---:|",
+    ]
+
+    def number(value):
+        return "-" if value is None else f"{value:.1f}"
+
+    for row in results:
+        lines.append(
+            f"| {row['server']} | {row['workload']} | {number(row['throughput'])} "
+            f"| {number(row['p50_ms'])} | {number(row['p95_ms'])} | {number(row['p99_ms'])} "
+            f"| {row['errors']} | {number(row['rss_mb'])} |"
+        )
+
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--servers", nargs="+", default=DEFAULT_SERVERS)
+    parser.add_argument("--workloads", nargs="+", choices=list(WORKLOADS), default=list(WORKLOADS))
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20, help="seconds per workload")
+    parser.add_argument("--warmup", type=float, default=3, help="seconds before measuring")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--startup-timeout", type=float, default=30)
+    parser.add_argument("--output", type=Path, default=BASE_DIR / "benchmark-results")
+    parser.add_argument("--setup", action="store_true", help="migrate and load books.yaml first")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for spec in args.servers:
+        # fail on a bad spec before anything runs
+        server_command(spec, args.port)
+        server_environment(spec, args.host)
+
+    if args.setup:
+        call_command("migrate", verbosity=0)
+        call_command("load_books", verbosity=0)
+
+    random.seed(args.seed)
+    pks = list(Book.objects.values_list("id", flat=True))
+
+    if not pks:
+        parser.error("The database has no books, run with --setup")
+
+    pks = random.sample(pks, min(len(pks), 1000))
+    results = [row for spec in args.servers for row in run_server(spec, args, pks)]
+
+    args.output.mkdir(parents=True, exist_ok=True)
+    (args.output / "report.json").write_text(json.dumps(results, indent=2))
+    (args.output / "report.md").write_text(markdown(results))
+
+    print(markdown(results))
+
+
+if __name__ == "__main__":
+    main()
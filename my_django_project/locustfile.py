@@ -1,33 +1,98 @@
+import json
 import os
-from random import randint
+from random import choice, randint
+from uuid import uuid4
 
 import django
 
 os.environ['DJANGO_SETTINGS_MODULE'] = 'my_django_project.settings'
 django.setup()
 
-from django.forms import model_to_dict
-from locust import HttpUser, task, between
+import requests
+from locust import HttpUser, task, between, events
 from django.urls import reverse
 
-from my_books.factories import BookFactory
+from my_books.models import Book
 
+LANGUAGES = Book.AvailableLanguages.values
 
-class ServerSideUser(HttpUser):
+
+class Catalogue:
+    """The ids of the books on the target host, fetched once per locust process.
+
+    Sampling real ids keeps reads from measuring 404s; the ids come from the
+    export endpoint so that they match whatever database the host serves.
+    """
+
+    pks = None
+
+    @classmethod
+    def random_pk(cls, host):
+        if cls.pks is None:
+            response = requests.get(host + reverse("book-rest-export"), params={"ndjson": 1, "fields": "id"})
+            response.raise_for_status()
+            cls.pks = [json.loads(line)["id"] for line in response.iter_lines() if line] or [1]
+
+        return choice(cls.pks)
+
+
+def new_book():
+    return {
+        "title": f"Book {randint(1, 1_000_000)}",
+        "author": f"Author {randint(1, 1_000)}",
+        "language": choice(LANGUAGES),
+        "pages": randint(100, 1000),
+    }
+
+
+class BookUser(HttpUser):
+    """Common task mix: create 2, read one 2, read all 1, update 1, delete 1.
+
+    Updates hit the real catalogue; deletes only remove books this user
+    created, so the catalogue keeps its size over a run.
+    """
+
+    abstract = True
     wait_time = between(1, 2)
 
+    def on_start(self):
+        self.created = []
+
+    @property
+    def random_pk(self):
+        return Catalogue.random_pk(self.host)
+
+    def pop_created(self):
+        return self.created.pop(randint(0, len(self.created) - 1)) if self.created else None
+
+
+class ServerSideUser(BookUser):
+    def post_form(self, url, data, name):
+        """Post ``data`` form-encoded with the CSRF token the form page sets."""
+        self.client.get(url, name=name)
+        data = {**data, "csrfmiddlewaretoken": self.client.cookies.get("csrftoken", "")}
+
+        return self.client.post(url, data=data, name=name, allow_redirects=False)
+
     @task(2)
     def create(self):
-        new_book = BookFactory()
         url = reverse("book-create")
+        book = {**new_book(), "title": f"Locust {uuid4().hex}"}
+        response = self.post_form(url, book, url)
 
-        self.client.post(url, json=model_to_dict(new_book))
+        if response.status_code == 302:
+            # the redirect goes to the list, so the new id is looked up by its
+            # unique title, outside the stats like the catalogue
+            found = requests.get(
+                self.host + reverse("book-rest-list"), params={"search": book["title"], "fields": "id"}
+            )
+            self.created += [row["id"] for row in found.json()]
 
     @task(2)
     def read_one(self):
         url = reverse("book-read", kwargs={"pk": self.random_pk})
 
-        self.client.get(url)
+        self.client.get(url, name="/books/[pk]/")
 
     @task(1)
     def read_all(self):
@@ -38,15 +103,131 @@ class ServerSideUser(HttpUser):
     def update(self):
         url = reverse("book-update", kwargs={"pk": self.random_pk})
 
-        new_book = BookFactory()
-        self.client.post(url, json=model_to_dict(new_book))
+        book = new_book()
+        self.post_form(url, {"pages": book["pages"], "language": book["language"]}, "/books/[pk]/update/")
 
     @task(1)
     def delete(self):
-        url = reverse("book-delete", kwargs={"pk": self.random_pk})
+        if (pk := self.pop_created()) is not None:
+            url = reverse("book-delete", kwargs={"pk": pk})
+            self.post_form(url, {}, "/books/[pk]/delete/")
 
-        self.client.delete(url)
 
-    @property
-    def random_pk(self):
-        return randint(1, 15_000)
+class RestUser(BookUser):
+    @task(2)
+    def create(self):
+        response = self.client.post(reverse("book-rest-list"), json=new_book())
+
+        if response.status_code == 201:
+            self.created.append(response.json()["id"])
+
+    @task(2)
+    def read_one(self):
+        url = reverse("book-rest-detail", kwargs={"pk": self.random_pk})
+
+        self.client.get(url, name="/books/api/[pk]/")
+
+    @task(1)
+    def read_all(self):
+        url = reverse("book-rest-list")
+        self.client.get(url, params={"page_size": 100}, name="/books/api/?page_size=100")
+
+    @task(1)
+    def update(self):
+        url = reverse("book-rest-detail", kwargs={"pk": self.random_pk})
+
+        book = new_book()
+        self.client.patch(url, json={"pages": book["pages"]}, name="/books/api/[pk]/")
+
+    @task(1)
+    def delete(self):
+        if (pk := self.pop_created()) is not None:
+            url = reverse("book-rest-detail", kwargs={"pk": pk})
+            self.client.delete(url, name="/books/api/[pk]/")
+
+
+class GraphQLUser(BookUser):
+    def graphql(self, name, query, **variables):
+        """Post ``query``; GraphQL errors answer 200, so they are failed explicitly."""
+        body = {"query": query, "variables": variables}
+
+        with self.client.post("/graphql/", json=body, name=f"graphql: {name}", catch_response=True) as response:
+            if response.status_code != 200:
+                response.failure(f"HTTP {response.status_code}")
+                return None
+
+            if errors := response.json().get("errors"):
+                response.failure(errors[0].get("message"))
+                return None
+
+            return response.json()["data"]
+
+    @task(2)
+    def create(self):
+        query = "mutation create($input: CreateBookInput!) { createBook(input: $input) { book { id } } }"
+
+        if data := self.graphql("createBook", query, input=new_book()):
+            self.created.append(int(data["createBook"]["book"]["id"]))
+
+    @task(2)
+    def read_one(self):
+        query = "query book($id: Int!) { book(id: $id) { id title author language pages } }"
+        self.graphql("book", query, id=self.random_pk)
+
+    @task(1)
+    def read_all(self):
+        query = "{ allBooks(first: 100) { edges { node { id title author language pages } } } }"
+        self.graphql("allBooks", query)
+
+    @task(1)
+    def update(self):
+        query = """
+        mutation update($id: ID!, $input: PatchBookInput!) {
+            updateBook(id: $id, input: $input) { book { id } }
+        }"""
+        self.graphql("updateBook", query, id=self.random_pk, input={"pages": new_book()["pages"]})
+
+    @task(1)
+    def delete(self):
+        if (pk := self.pop_created()) is not None:
+            query = "mutation delete($id: ID!) { deleteBook(id: $id) { found } }"
+            self.graphql("deleteBook", query, id=pk)
+
+
+# headless runs: --stats-json <path> writes per-endpoint stats on exit
+
+
+@events.init_command_line_parser.add_listener
+def add_arguments(parser):
+    parser.add_argument("--stats-json", default="", help="Write per-endpoint stats to this JSON file on exit")
+
+
+@events.quitting.add_listener
+def write_stats_json(environment, **kwargs):
+    if not (path := environment.parsed_options and environment.parsed_options.stats_json):
+        return
+
+    stats = environment.stats
+    entries = [*stats.entries.values(), stats.total]
+
+    with open(path, "w") as output:
+        json.dump(
+            [
+                {
+                    "method": entry.method,
+                    "name": entry.name,
+                    "requests": entry.num_requests,
+                    "failures": entry.num_failures,
+                    "rps": entry.total_rps,
+                    "avg_ms": entry.avg_response_time,
+                    "min_ms": entry.min_response_time,
+                    "max_ms": entry.max_response_time,
+                    "p50_ms": entry.get_response_time_percentile(0.50),
+                    "p95_ms": entry.get_response_time_percentile(0.95),
+                    "p99_ms": entry.get_response_time_percentile(0.99),
+                }
+                for entry in entries
+            ],
+            output,
+            indent=2,
+        )
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class MyBooksConfig(AppConfig):
     name = 'my_books'
+
+    def ready(self):
+        from . import signals  # noqa: F401
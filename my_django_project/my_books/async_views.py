@@ -0,0 +1,82 @@
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.db import connections
+from django.http import Http404, HttpResponse, HttpResponseBadRequest
+
+from rest_framework.exceptions import ValidationError
+
+from .cache import book_cache
+from .models import Book
+from .streaming import dumps
+from .viewsets import BookViewSet, parse_fields, sparse_serializer
+
+# The ORM is synchronous, so async views hand their queries to a pool of at
+# most BOOKS_ASYNC_DB_WORKERS threads: that bounds the connections they open,
+# and unlike ``sync_to_async`` the queries do not queue on the single
+# thread-sensitive executor.
+executor = ThreadPoolExecutor(max_workers=settings.BOOKS_ASYNC_DB_WORKERS, thread_name_prefix="books-db")
+
+
+def _call(func, *args):
+    try:
+        return func(*args)
+    finally:
+        # what request_finished does for sync views, honouring CONN_MAX_AGE
+        for connection in connections.all():
+            connection.close_if_unusable_or_obsolete()
+
+
+async def run_db(func, *args):
+    """Run ``func(*args)`` on the database pool without blocking the event loop.
+
+    It runs in a copy of the caller's context, so request-scoped context
+    variables such as the instrumentation's still apply.
+    """
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(executor, partial(context.run, _call, func, *args))
+
+
+def json_response(data, response_class=HttpResponse):
+    return response_class(dumps(data), content_type="application/json")
+
+
+def get_fast_serializer(request):
+    if fields := request.GET.get("fields"):
+        return sparse_serializer(parse_fields(fields))
+
+    return BookViewSet.fast_serializer
+
+
+def list_data(serializer, key):
+    if (data := book_cache.get_list(key)) is None:
+        data = serializer.serialize(serializer.values(Book.objects.order_by("id")))
+        book_cache.set_list(key, data)
+
+    return data
+
+
+async def book_list(request):
+    """Async twin of ``GET /books/api/``: every book, with an optional ``?fields=``."""
+    try:
+        serializer = get_fast_serializer(request)
+    except ValidationError as error:
+        return json_response(error.detail, HttpResponseBadRequest)
+
+    return json_response(await run_db(list_data, serializer, request.build_absolute_uri()))
+
+
+async def book_read(request, pk):
+    """Async twin of ``GET /books/api/<pk>/``."""
+    try:
+        serializer = get_fast_serializer(request)
+    except ValidationError as error:
+        return json_response(error.detail, HttpResponseBadRequest)
+
+    if (row := (await run_db(book_cache.rows, [pk])).get(pk)) is None:
+        raise Http404("No book found matching the query")
+
+    return json_response(serializer.to_representation(dict(row)))
@@ -0,0 +1,119 @@
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .cache import book_cache
+from .models import Book
+from .serializers import BookSerializer
+
+NOT_FOUND = "Book matching query does not exist."
+INVALID_ID = "A valid integer is required."
+
+
+def _pk(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def create_books(items):
+    """Validate ``items`` and insert the valid ones with batched ``bulk_create``.
+
+    Returns ``(books, errors)`` where ``errors`` maps the index of every
+    rejected item to its validation errors. Valid items are written in one
+    transaction even when some others are rejected.
+    """
+    books, errors = [], {}
+
+    for index, item in enumerate(items):
+        serializer = BookSerializer(data=item)
+
+        if serializer.is_valid():
+            books.append(Book(**serializer.validated_data))
+        else:
+            errors[index] = serializer.errors
+
+    with transaction.atomic():
+        Book.objects.bulk_create(books, batch_size=settings.BOOKS_BULK_BATCH_SIZE)
+
+        if books and not connection.features.can_return_rows_from_bulk_insert:
+            # the open transaction holds the write lock, so the newest ids are ours
+            pks = Book.objects.order_by("-id").values_list("id", flat=True)[: len(books)]
+
+            for book, pk in zip(books, reversed(pks)):
+                book.pk = pk
+
+    book_cache.invalidate(*(book.pk for book in books))
+
+    return books, errors
+
+
+def update_books(items):
+    """Apply the partial updates in ``items`` (each one carrying its ``id``) with ``bulk_update``.
+
+    Returns ``(books, errors)`` like ``create_books``.
+    """
+    books, errors, fields = [], {}, set()
+
+    pks = [_pk(item.get("id")) if isinstance(item, dict) else None for item in items]
+    valid_pks = [pk for pk in pks if pk is not None]
+
+    with transaction.atomic():
+        instances = Book.objects.select_for_update().in_bulk(valid_pks)
+
+        for index, (pk, item) in enumerate(zip(pks, items)):
+            book = instances.get(pk)
+
+            if book is None:
+                errors[index] = {"id": [INVALID_ID if pk is None else NOT_FOUND]}
+                continue
+
+            data = {field: value for field, value in item.items() if field != "id"}
+            serializer = BookSerializer(book, data=data, partial=True)
+
+            if not serializer.is_valid():
+                errors[index] = serializer.errors
+                continue
+
+            for field, value in serializer.validated_data.items():
+                setattr(book, field, value)
+
+            fields.update(serializer.validated_data)
+            books.append(book)
+
+        if fields:
+            # bulk_update skips pre_save, so auto_now is applied by hand
+            updated_at = timezone.now()
+            for book in books:
+                book.updated_at = updated_at
+
+            fields.add("updated_at")
+            Book.objects.bulk_update(books, fields, batch_size=settings.BOOKS_BULK_BATCH_SIZE)
+
+    book_cache.invalidate(*(book.pk for book in books))
+
+    return books, errors
+
+
+def delete_books(ids):
+    """Delete the books in ``ids`` with a single ``pk__in`` delete.
+
+    Returns ``(deleted_ids, errors)`` like ``create_books``.
+    """
+    pks = [_pk(pk) for pk in ids]
+    valid_pks = [pk for pk in pks if pk is not None]
+
+    with transaction.atomic():
+        found = set(Book.objects.filter(pk__in=valid_pks).values_list("pk", flat=True))
+        Book.objects.filter(pk__in=found).delete()
+
+    book_cache.invalidate(*found)
+
+    errors = {
+        index: {"id": [INVALID_ID if pk is None else NOT_FOUND]}
+        for index, pk in enumerate(pks)
+        if pk not in found
+    }
+
+    return sorted(found), errors
@@ -0,0 +1,218 @@
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from .models import Book
+
+
+def as_row(book):
+    """Return ``book`` as the ``.values()`` dict the cache stores."""
+    return {field.attname: getattr(book, field.attname) for field in Book._meta.concrete_fields}
+
+
+def from_row(row):
+    return Book.from_db(Book.objects.db, list(row), list(row.values()))
+
+
+class LocalCache:
+    """A thread-safe, size-bounded LRU whose entries expire after ``timeout`` seconds."""
+
+    def __init__(self, maxsize, timeout):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self.entries = OrderedDict()
+        self.lock = Lock()
+
+    def get_many(self, keys):
+        now, found = monotonic(), {}
+
+        with self.lock:
+            for key in keys:
+                entry = self.entries.get(key)
+
+                if entry is None:
+                    continue
+
+                if entry[0] < now:
+                    del self.entries[key]
+                    continue
+
+                self.entries.move_to_end(key)
+                found[key] = entry[1]
+
+        return found
+
+    def set_many(self, mapping):
+        expires = monotonic() + self.timeout
+
+        with self.lock:
+            for key, value in mapping.items():
+                self.entries[key] = (expires, value)
+                self.entries.move_to_end(key)
+
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def delete_many(self, keys):
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class BookCache:
+    """Two-level read cache for book rows, their HTML fragments and list responses.
+
+    Lookups go to an in-process LRU first and then to the shared Django cache
+    named by ``BOOKS_CACHE_ALIAS``. Book rows are invalidated by primary key
+    from the model signals and the bulk paths; list responses are keyed by a
+    shared version number bumped on every write, so they are never stale.
+    Rows in the local layer of other workers may lag for up to
+    ``BOOKS_CACHE_LOCAL_TIMEOUT`` seconds. This holds only when every worker
+    shares that cache: with a per-process one such as ``LocMemCache``,
+    invalidations never reach the other workers. Cached values are shared:
+    treat them as read-only.
+    """
+
+    version_key = "books:version"
+
+    def __init__(self, alias, timeout, local_size, local_timeout, enabled=True):
+        self.alias = alias
+        self.timeout = timeout
+        self.enabled = enabled
+        self.local = LocalCache(local_size, local_timeout)
+        self.lock = Lock()
+        self.local_hits = self.shared_hits = self.misses = 0
+
+    @property
+    def shared(self):
+        return caches[self.alias]
+
+    def get_many(self, keys):
+        if not self.enabled:
+            return {}
+
+        keys = list(keys)
+        found = self.local.get_many(keys)
+        local_hits = len(found)
+
+        if missing := [key for key in keys if key not in found]:
+            shared = self.shared.get_many(missing)
+            self.local.set_many(shared)
+            found.update(shared)
+
+        with self.lock:
+            self.local_hits += local_hits
+            self.shared_hits += len(found) - local_hits
+            self.misses += len(keys) - len(found)
+
+        return found
+
+    def set_many(self, mapping):
+        if self.enabled and mapping:
+            self.local.set_many(mapping)
+            self.shared.set_many(mapping, timeout=self.timeout)
+
+    def get_book_rows(self, pks):
+        """Return the cached rows of ``pks`` that are cached, keyed by pk."""
+        found = self.get_many(f"book:{pk}" for pk in pks)
+        return {row["id"]: row for row in found.values()}
+
+    def set_book_rows(self, rows):
+        self.set_many({f"book:{row['id']}": row for row in rows})
+
+    def get_fragments(self, pks):
+        """Return the cached HTML fragments of ``pks`` that are cached, keyed by pk."""
+        found = self.get_many(f"book:{pk}:html" for pk in pks)
+        return {int(key.split(":")[1]): html for key, html in found.items()}
+
+    def set_fragments(self, fragments):
+        self.set_many({f"book:{pk}:html": html for pk, html in fragments.items()})
+
+    def rows(self, pks, queryset=None):
+        """Return the rows of ``pks`` keyed by pk, loading cache misses from ``queryset``.
+
+        Cached rows cannot be checked against the filters of ``queryset``, so a
+        filtered ``queryset`` loads every row and only refreshes the cache.
+        """
+        queryset = Book.objects.all() if queryset is None else queryset
+        found = {} if queryset.query.has_filters() else self.get_book_rows(pks)
+
+        if missing := [pk for pk in pks if pk not in found]:
+            loaded = list(queryset.filter(pk__in=missing).values())
+            self.set_book_rows(loaded)
+            found.update((row["id"], row) for row in loaded)
+
+        return found
+
+    def list_key(self, key):
+        if not self.enabled:
+            return None
+
+        return f"books:list:{self.shared.get_or_set(self.version_key, 0, timeout=None)}:{key}"
+
+    def get_list(self, key):
+        """Return the list response cached under ``key`` for the current version, if any."""
+        if (versioned := self.list_key(key)) is not None:
+            return self.get_many([versioned]).get(versioned)
+
+    def set_list(self, key, data):
+        if (versioned := self.list_key(key)) is not None:
+            self.set_many({versioned: data})
+
+    def invalidate(self, *pks):
+        """Drop the rows and fragments of ``pks`` and every list response.
+
+        The drop is repeated once the current transaction commits, so that a
+        read racing the write cannot leave the old row cached.
+        """
+
+        def drop():
+            keys = [key for pk in pks for key in (f"book:{pk}", f"book:{pk}:html")]
+
+            self.local.delete_many(keys)
+            self.shared.delete_many(keys)
+
+            try:
+                self.shared.incr(self.version_key)
+            except ValueError:
+                self.shared.set(self.version_key, 1, timeout=None)
+
+        if self.enabled:
+            drop()
+            transaction.on_commit(drop)
+
+    def clear(self):
+        self.local.clear()
+        self.shared.clear()
+
+        with self.lock:
+            self.local_hits = self.shared_hits = self.misses = 0
+
+    def stats(self):
+        with self.lock:
+            lookups = self.local_hits + self.shared_hits + self.misses
+            hits = self.local_hits + self.shared_hits
+
+            return {
+                "local_hits": self.local_hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "hit_ratio": hits / lookups if lookups else 0.0,
+            }
+
+
+book_cache = BookCache(
+    alias=settings.BOOKS_CACHE_ALIAS,
+    timeout=settings.BOOKS_CACHE_TIMEOUT,
+    local_size=settings.BOOKS_CACHE_LOCAL_SIZE,
+    local_timeout=settings.BOOKS_CACHE_LOCAL_TIMEOUT,
+    enabled=settings.BOOKS_CACHE_ENABLED,
+)
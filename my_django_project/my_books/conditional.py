@@ -0,0 +1,89 @@
+from calendar import timegm
+from hashlib import sha256
+
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .cache import book_cache
+from .models import Book
+
+
+def make_etag(*parts):
+    return quote_etag(sha256("|".join(map(str, parts)).encode("utf-8")).hexdigest()[:32])
+
+
+def aware(value):
+    return timezone.make_aware(value) if timezone.is_naive(value) else value
+
+
+def row_etag(row, *variant):
+    """Return the etag of one book row.
+
+    ``variant`` holds whatever else the representation depends on, such as the
+    request path or the renderer.
+    """
+    return make_etag(row["id"], row["updated_at"].isoformat(), *variant)
+
+
+def list_etag(queryset, *variant):
+    """Return the etag of a book list from ``max(updated_at)`` and ``count(*)``.
+
+    The count catches deletions, which leave ``max(updated_at)`` untouched;
+    for the same reason lists get no ``Last-Modified``.
+    """
+    state = queryset.aggregate(updated_at=Max("updated_at"), count=Count("pk"))
+    updated_at = state["updated_at"] and state["updated_at"].isoformat()
+
+    return make_etag(state["count"], updated_at, *variant)
+
+
+def page_etag(rows, *variant):
+    """Return the etag of a keyset page from its own rows' ids and ``max(updated_at)``.
+
+    Unlike ``list_etag`` it reads no more than the page, whatever the table
+    size. Every write stamps ``updated_at``, and rows entering or leaving the
+    page change the ids.
+    """
+    updated_at = max((row["updated_at"] for row in rows), default=None)
+
+    return make_etag([row["id"] for row in rows], updated_at and updated_at.isoformat(), *variant)
+
+
+# ``django.views.decorators.http.condition`` callbacks for the HTML views
+
+
+def book_etag(request, pk):
+    if (row := book_cache.rows([pk]).get(pk)) is not None:
+        return row_etag(row, request.get_full_path())
+
+
+def book_last_modified(request, pk):
+    if (row := book_cache.rows([pk]).get(pk)) is not None:
+        return aware(row["updated_at"])
+
+
+def book_list_etag(request):
+    return list_etag(Book.objects.all(), request.get_full_path())
+
+
+def conditional(request, respond, etag=None, last_modified=None):
+    """Answer ``304``/``412`` from the validators, else the response ``respond()`` builds.
+
+    The REST counterpart of ``condition``: the validators come from data the
+    view already holds, so nothing is serialized when the client copy is current.
+    """
+    last_modified = last_modified and timegm(aware(last_modified).utctimetuple())
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+    if response is None:
+        response = respond()
+
+    if etag and not response.has_header("ETag"):
+        response["ETag"] = etag
+
+    if last_modified and not response.has_header("Last-Modified"):
+        response["Last-Modified"] = http_date(last_modified)
+
+    return response
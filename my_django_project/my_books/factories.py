@@ -13,4 +13,4 @@ class BookFactory(factory.Factory):
     title = FuzzyText(prefix="Book ", length=10, chars=string.printable)
     author = FuzzyText(length=5, chars=string.ascii_letters)
     pages = FuzzyInteger(100, 1000)
-    language = FuzzyChoice(Book.AvailableLanguages.labels)
+    language = FuzzyChoice(Book.AvailableLanguages.values)
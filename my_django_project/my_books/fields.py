@@ -0,0 +1,50 @@
+from django.core import exceptions
+from django.db import models
+
+
+class LanguageField(models.SmallIntegerField):
+    """A language stored as a small integer but read and written as its choice code.
+
+    Every code is stored as its position in ``choices``, so new choices must be
+    appended, never inserted or reordered. Labels are accepted on the way in
+    and normalized to their code; anything else is rejected. Forms, serializers
+    and GraphQL only ever see the codes.
+    """
+
+    description = "Language code stored as a small integer"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.codes = [code for code, _ in self.flatchoices]
+        self.numbers = {code: number for number, code in enumerate(self.codes)}
+        self.numbers.update((label, self.numbers[code]) for code, label in self.flatchoices)
+
+    @property
+    def validators(self):
+        # the integer range validators would compare codes with numbers
+        return [*self.default_validators, *self._validators]
+
+    def to_python(self, value):
+        if value is None or value in self.codes:
+            return value
+
+        if isinstance(value, str) and value in self.numbers:
+            return self.codes[self.numbers[value]]
+
+        raise exceptions.ValidationError(
+            self.error_messages["invalid_choice"], code="invalid_choice", params={"value": value}
+        )
+
+    def from_db_value(self, value, expression, connection):
+        return None if value is None else self.codes[value]
+
+    def get_prep_value(self, value):
+        value = models.Field.get_prep_value(self, value)
+
+        if value is None or isinstance(value, int):
+            return value
+
+        try:
+            return self.numbers[value]
+        except (KeyError, TypeError):
+            raise ValueError(f"Unknown language: {value!r}")
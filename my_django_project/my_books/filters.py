@@ -0,0 +1,104 @@
+from django.db import connections
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend, OrderingFilter
+
+from .models import Book
+
+
+def prefix_range(prefix):
+    """Return the ``[lower, upper)`` code point range of the strings starting with ``prefix``.
+
+    ``upper`` is ``None`` when no string sorts after every match. The range is
+    only right under a binary collation, such as SQLite's: see
+    ``BookFilterBackend.prefix_lookups``.
+    """
+    for end in reversed(range(len(prefix))):
+        code = ord(prefix[end]) + 1
+
+        # surrogates cannot be stored, the next storable character follows them
+        if code == 0xD800:
+            code = 0xE000
+
+        if code <= 0x10FFFF:
+            return prefix, prefix[:end] + chr(code)
+
+    return prefix, None
+
+
+class BookFilterBackend(BaseFilterBackend):
+    """Filter books in SQL from the query string.
+
+    ``?author=`` and ``?language=`` (a language code) match exactly,
+    ``?pages__gte=`` and ``?pages__lte=`` bound the page count and
+    ``?search=`` matches a title prefix. Every filter is served by one of the
+    ``Book`` indexes.
+    """
+
+    exact_params = ("author", "language")
+    range_params = ("pages__gte", "pages__lte")
+    search_param = "search"
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+        lookups, errors = {}, {}
+
+        for param in self.exact_params:
+            if (value := params.get(param)) is not None:
+                lookups[param] = value
+
+        if (language := lookups.get("language")) is not None and language not in Book.AvailableLanguages.values:
+            errors["language"] = [f'"{language}" is not a valid choice.']
+
+        for param in self.range_params:
+            if (value := params.get(param)) is not None:
+                try:
+                    lookups[param] = int(value)
+                except ValueError:
+                    errors[param] = ["A valid integer is required."]
+
+        if errors:
+            raise ValidationError(errors)
+
+        if prefix := params.get(self.search_param):
+            lookups.update(self.prefix_lookups(prefix, connections[queryset.db].vendor))
+
+        return queryset.filter(**lookups)
+
+    def prefix_lookups(self, prefix, vendor):
+        """Return the lookups of the titles starting with ``prefix``, in the index's terms.
+
+        SQLite serves ``LIKE 'prefix%'`` from no index, but serves the
+        equivalent range from ``book_title_idx`` since it compares strings
+        byte by byte. PostgreSQL compares them by collation, where the range
+        does not hold, and serves ``LIKE`` from ``book_title_pattern_idx``.
+        """
+        if vendor != "sqlite":
+            return {"title__startswith": prefix}
+
+        lower, upper = prefix_range(prefix)
+        lookups = {"title__gte": lower, "title__startswith": prefix}
+
+        if upper is not None:
+            lookups["title__lt"] = upper
+
+        return lookups
+
+
+class StrictOrderingFilter(OrderingFilter):
+    """``OrderingFilter`` that rejects unknown fields instead of ignoring them.
+
+    Only ``ordering_fields`` are accepted, so clients cannot ask for a sort no
+    index can serve.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        if params := request.query_params.get(self.ordering_param):
+            fields = [param.strip() for param in params.split(",")]
+            valid = {name for name, _ in self.get_valid_fields(queryset, view, {"request": request})}
+
+            if invalid := [field for field in fields if field.lstrip("-") not in valid]:
+                raise ValidationError(
+                    {self.ordering_param: [f"Invalid ordering field: {field}" for field in invalid]}
+                )
+
+        return super().get_ordering(request, queryset, view)
@@ -0,0 +1,158 @@
+import json
+from collections import OrderedDict
+from functools import partial
+from hashlib import sha256
+from threading import Lock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http.response import HttpResponseBadRequest
+
+from graphene_django.views import GraphQLView, HttpError
+from graphql.backend import GraphQLCoreBackend, GraphQLDocument
+from graphql.execution import ExecutionResult, execute
+from graphql.language.base import parse
+from graphql.validation import validate
+
+
+def query_hash(query):
+    return sha256(query.encode("utf-8")).hexdigest()
+
+
+class PersistedQueryNotFound(Exception):
+    pass
+
+
+class CachedDocumentBackend(GraphQLCoreBackend):
+    """Keeps the ``maxsize`` most recently used documents parsed *and* validated.
+
+    Documents are keyed by the SHA-256 of their query string, so a hot
+    operation is parsed and validated once per worker; later executions go
+    straight to the executor. Documents failing validation are not cached.
+    """
+
+    def __init__(self, maxsize, executor=None):
+        super().__init__(executor)
+        self.maxsize = maxsize
+        self.documents = OrderedDict()
+        self.lock = Lock()
+        self.hits = self.misses = 0
+
+    def document_from_string(self, schema, document_string):
+        key = (schema, query_hash(document_string))
+
+        with self.lock:
+            document = self.documents.get(key)
+
+            if document is not None:
+                self.documents.move_to_end(key)
+                self.hits += 1
+                return document
+
+            self.misses += 1
+
+        document_ast = parse(document_string)
+
+        if errors := validate(schema, document_ast):
+            return GraphQLDocument(
+                schema=schema,
+                document_string=document_string,
+                document_ast=document_ast,
+                execute=lambda *args, **kwargs: ExecutionResult(errors=errors, invalid=True),
+            )
+
+        document = GraphQLDocument(
+            schema=schema,
+            document_string=document_string,
+            document_ast=document_ast,
+            execute=partial(execute, schema, document_ast, **self.execute_params),
+        )
+
+        with self.lock:
+            self.documents[key] = document
+
+            if len(self.documents) > self.maxsize:
+                self.documents.popitem(last=False)
+
+        return document
+
+    def cache_info(self):
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "maxsize": self.maxsize,
+                "currsize": len(self.documents),
+            }
+
+    def cache_clear(self):
+        with self.lock:
+            self.documents.clear()
+            self.hits = self.misses = 0
+
+
+document_backend = CachedDocumentBackend(maxsize=settings.GRAPHQL_DOCUMENT_CACHE_SIZE)
+
+
+class PersistedQueryView(GraphQLView):
+    """``GraphQLView`` speaking the Automatic Persisted Queries protocol.
+
+    A request may send ``extensions.persistedQuery.sha256Hash`` instead of the
+    query. Unknown hashes answer ``PersistedQueryNotFound`` so the client can
+    retry with both the hash and the query, which registers it in the default
+    cache. With a per-process backend such as the default ``LocMemCache``
+    every worker keeps its own registry, and answers ``PersistedQueryNotFound``
+    once per hash. Documents come from ``document_backend``.
+    """
+
+    def get_backend(self, request):
+        return document_backend
+
+    def get_graphql_params(self, request, data):
+        query, variables, operation_name, id = super().get_graphql_params(request, data)
+
+        extensions = request.GET.get("extensions") or data.get("extensions") or {}
+
+        if isinstance(extensions, str):
+            try:
+                extensions = json.loads(extensions)
+            except ValueError:
+                raise HttpError(HttpResponseBadRequest("Extensions are invalid JSON."))
+
+        if not isinstance(extensions, dict):
+            raise HttpError(HttpResponseBadRequest("Extensions must be an object."))
+
+        persisted_query = extensions.get("persistedQuery")
+
+        if not persisted_query:
+            return query, variables, operation_name, id
+
+        if not isinstance(persisted_query, dict) or not isinstance(persisted_query.get("sha256Hash"), str):
+            raise HttpError(HttpResponseBadRequest("persistedQuery must be an object with a sha256Hash."))
+
+        key = f"graphql:persisted:{persisted_query['sha256Hash']}"
+
+        if query is None:
+            query = cache.get(key)
+
+            if query is None:
+                raise PersistedQueryNotFound()
+
+        elif query_hash(query) != persisted_query["sha256Hash"]:
+            raise HttpError(HttpResponseBadRequest("provided sha does not match query"))
+
+        else:
+            cache.set(key, query, timeout=settings.GRAPHQL_PERSISTED_QUERY_TIMEOUT)
+
+        return query, variables, operation_name, id
+
+    def get_response(self, request, data, show_graphiql=False):
+        try:
+            return super().get_response(request, data, show_graphiql)
+        except PersistedQueryNotFound:
+            error = {
+                "message": "PersistedQueryNotFound",
+                "extensions": {"code": "PERSISTED_QUERY_NOT_FOUND"},
+            }
+
+            return self.json_encode(request, {"errors": [error]}), 200
@@ -0,0 +1,203 @@
+import csv
+import io
+import json
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import book_cache
+from .models import Book
+
+FORMATS = ("csv", "ndjson")
+
+REQUIRED = "This field is required."
+TOO_LONG = "Ensure this field has no more than {} characters."
+INVALID_INT = "A valid integer is required."
+INVALID_CHOICE = '"{}" is not a valid choice.'
+INVALID_ROW = "Expected an object."
+
+
+def language_codes():
+    """Map both the labels and the codes of ``Book.AvailableLanguages`` to the code."""
+    codes = {code: code for code in Book.AvailableLanguages.values}
+    codes.update((label, code) for code, label in Book.AvailableLanguages.choices)
+    return codes
+
+
+def guess_format(name):
+    """Return the format of a file from its name: ``.csv``, or ``.ndjson``/``.jsonl``."""
+    suffix = name.rsplit(".", 1)[-1].lower()
+    return {"csv": "csv", "ndjson": "ndjson", "jsonl": "ndjson"}.get(suffix)
+
+
+def read_csv(stream):
+    """Yield ``(line, row)`` for every record of a binary CSV stream with a header row."""
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding="utf-8-sig", newline=""))
+
+    for row in reader:
+        yield reader.line_num, row
+
+
+def read_ndjson(stream):
+    """Yield ``(line, row)`` for every line of a binary NDJSON stream; broken lines yield ``None``."""
+    for line, text in enumerate(stream, 1):
+        if not text.strip():
+            continue
+
+        try:
+            yield line, json.loads(text)
+        except ValueError:
+            yield line, None
+
+
+READERS = {"csv": read_csv, "ndjson": read_ndjson}
+
+
+class ImportReport:
+    """Counters of an import, plus the first ``max_rejects`` rejected rows."""
+
+    def __init__(self, max_rejects):
+        self.rows = self.created = self.updated = self.unchanged = self.rejected = 0
+        self.rejects = []
+        self.max_rejects = max_rejects
+
+    def reject(self, line, errors):
+        self.rejected += 1
+
+        if len(self.rejects) < self.max_rejects:
+            self.rejects.append({"line": line, "errors": errors})
+
+    def as_dict(self):
+        return {
+            "rows": self.rows,
+            "created": self.created,
+            "updated": self.updated,
+            "unchanged": self.unchanged,
+            "rejected": self.rejected,
+            "rejects": self.rejects,
+        }
+
+
+class BookImporter:
+    """Stream book rows into the table, upserting them by ``(title, author)``.
+
+    Rows are read, validated and written ``batch_size`` at a time, each batch
+    in its own transaction: one ``SELECT`` finds the existing books of the
+    batch, then ``bulk_create`` inserts the new ones and ``bulk_update``
+    changes the others. Only one batch is ever held in memory, however large
+    the input. Rows that leave a book as it was are not written at all.
+
+    ``on_reject(line, errors)`` is called for every rejected row and
+    ``on_batch(report)`` after every batch.
+    """
+
+    fields = ("title", "author", "pages", "language")
+
+    def __init__(self, batch_size=None, max_rejects=None, on_reject=None, on_batch=None):
+        self.batch_size = batch_size or settings.BOOKS_BULK_BATCH_SIZE
+        self.report = ImportReport(settings.BOOKS_IMPORT_MAX_REJECTS if max_rejects is None else max_rejects)
+        self.on_reject = on_reject
+        self.on_batch = on_batch
+        self.languages = language_codes()
+        self.max_lengths = {name: Book._meta.get_field(name).max_length for name in ("title", "author")}
+
+    def run(self, stream, format):
+        """Import every row of the binary ``stream`` in ``format`` and return the report."""
+        rows = READERS[format](stream)
+
+        while batch := list(islice(rows, self.batch_size)):
+            self.import_batch(batch)
+
+            if self.on_batch:
+                self.on_batch(self.report)
+
+        return self.report
+
+    def validate(self, row):
+        """Return ``(values, errors)`` for one raw row; ``values`` is ``None`` when rejected."""
+        if not isinstance(row, dict):
+            return None, {"non_field_errors": [INVALID_ROW]}
+
+        values, errors = {}, {}
+
+        for name, max_length in self.max_lengths.items():
+            value = row.get(name)
+            value = value.strip() if isinstance(value, str) else ""
+
+            if not value:
+                errors[name] = [REQUIRED]
+            elif len(value) > max_length:
+                errors[name] = [TOO_LONG.format(max_length)]
+            else:
+                values[name] = value
+
+        pages = row.get("pages")
+        try:
+            if isinstance(pages, (bool, float)):
+                raise ValueError
+            values["pages"] = int(pages)
+        except (TypeError, ValueError):
+            errors["pages"] = [REQUIRED if pages in (None, "") else INVALID_INT]
+
+        language = row.get("language") or Book.AvailableLanguages.UNKNOWN
+        # lists and objects are unhashable, numbers are never a label or a code
+        if (code := self.languages.get(language) if isinstance(language, str) else None) is None:
+            errors["language"] = [INVALID_CHOICE.format(language)]
+        else:
+            values["language"] = code
+
+        return (None, errors) if errors else (values, None)
+
+    def import_batch(self, batch):
+        report = self.report
+        valid = {}
+
+        for line, row in batch:
+            report.rows += 1
+            values, errors = self.validate(row)
+
+            if errors:
+                report.reject(line, errors)
+
+                if self.on_reject:
+                    self.on_reject(line, errors)
+            else:
+                # the last row of a natural key wins, as if rows were applied in order
+                valid[values["title"], values["author"]] = values
+
+        if not valid:
+            return
+
+        with transaction.atomic():
+            existing = {}
+            queryset = Book.objects.select_for_update().filter(title__in={title for title, _ in valid})
+
+            for book in queryset.only(*self.fields):
+                if (book.title, book.author) in valid:
+                    existing.setdefault((book.title, book.author), []).append(book)
+
+            created, updated, updated_at = [], [], timezone.now()
+
+            for key, values in valid.items():
+                if key not in existing:
+                    created.append(Book(**values))
+                    continue
+
+                for book in existing[key]:
+                    if (book.pages, book.language) == (values["pages"], values["language"]):
+                        report.unchanged += 1
+                        continue
+
+                    # bulk_update skips pre_save, so auto_now is applied by hand
+                    book.pages, book.language, book.updated_at = values["pages"], values["language"], updated_at
+                    updated.append(book)
+
+            Book.objects.bulk_create(created, batch_size=self.batch_size)
+            Book.objects.bulk_update(updated, ["pages", "language", "updated_at"], batch_size=self.batch_size)
+
+        report.created += len(created)
+        report.updated += len(updated)
+
+        book_cache.invalidate(*(book.pk for book in updated))
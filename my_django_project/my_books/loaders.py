@@ -0,0 +1,81 @@
+from collections import defaultdict
+
+from django.db.models import Q
+
+from promise import Promise
+from promise.dataloader import DataLoader
+
+from .cache import as_row, book_cache, from_row
+from .models import Book
+
+
+class BookLoader(DataLoader):
+    """Batches the book lookups of one GraphQL operation into a single query.
+
+    Keys are ``("id", <int>)`` or ``("title", <str>)`` tuples. Ids found in
+    ``book_cache`` skip the database. Missing or ambiguous keys resolve to the
+    same errors ``Book.objects.get`` would raise.
+    """
+
+    def batch_load_fn(self, keys):
+        lookups = defaultdict(set)
+        for field, value in keys:
+            lookups[field].add(value)
+
+        cached = book_cache.get_book_rows(lookups["id"])
+        lookups["id"] -= cached.keys()
+
+        by_id = {pk: from_row(row) for pk, row in cached.items()}
+        by_title = defaultdict(list)
+
+        if lookups["id"] or lookups["title"]:
+            query = Q()
+            for field, values in lookups.items():
+                if values:
+                    query |= Q(**{f"{field}__in": values})
+
+            books = list(Book.objects.filter(query))
+            book_cache.set_book_rows(map(as_row, books))
+
+            for book in books:
+                by_id[book.id] = book
+                by_title[book.title].append(book)
+
+        return Promise.resolve(
+            [
+                self.pick([by_id[value]] if value in by_id else [])
+                if field == "id"
+                else self.pick(by_title[value])
+                for field, value in keys
+            ]
+        )
+
+    @staticmethod
+    def pick(books):
+        if not books:
+            return Book.DoesNotExist("Book matching query does not exist.")
+
+        if len(books) > 1:
+            return Book.MultipleObjectsReturned(
+                f"get() returned more than one Book -- it returned {len(books)}!"
+            )
+
+        return books[0]
+
+
+def get_book_loader(info):
+    """Return the ``BookLoader`` shared by every resolver of the current operation.
+
+    The loader lives on ``info.context`` (the request under ``GraphQLView``), so
+    its cache never outlives the request. Without a context every call gets a
+    fresh loader, which is correct but does not batch.
+    """
+    loader = getattr(info.context, "book_loader", None)
+
+    if loader is None:
+        loader = BookLoader()
+
+        if info.context is not None:
+            info.context.book_loader = loader
+
+    return loader
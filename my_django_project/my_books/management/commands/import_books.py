@@ -0,0 +1,58 @@
+import json
+import sys
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from my_books.importers import FORMATS, BookImporter, guess_format
+
+
+class Command(BaseCommand):
+    help = "Stream a CSV or NDJSON file of books into the table, upserting by title and author."
+
+    def add_arguments(self, parser):
+        parser.add_argument("file", help="a .csv, .ndjson or .jsonl file, or - for stdin")
+        parser.add_argument("--format", choices=FORMATS, help="the file format, guessed from its name by default")
+        parser.add_argument("--batch-size", type=int)
+        parser.add_argument("--rejects", type=Path, help="write every rejected row to this NDJSON file")
+
+    def handle(self, *args, file, format, batch_size, rejects, **options):
+        if not (format := format or guess_format(file)):
+            raise CommandError(f"Cannot tell the format of {file}, use --format")
+
+        if file != "-" and not Path(file).exists():
+            raise CommandError(f"No such file: {file}")
+
+        rejects_file = open(rejects, "w") if rejects else None
+
+        def on_reject(line, errors):
+            if rejects_file:
+                rejects_file.write(json.dumps({"line": line, "errors": errors}) + "\n")
+
+        def on_batch(report):
+            if options["verbosity"]:
+                self.stderr.write(
+                    f"{report.rows} rows: {report.created} created, {report.updated} updated, "
+                    f"{report.rejected} rejected"
+                )
+
+        importer = BookImporter(batch_size=batch_size, max_rejects=0, on_reject=on_reject, on_batch=on_batch)
+
+        try:
+            if file == "-":
+                report = importer.run(sys.stdin.buffer, format)
+            else:
+                with open(file, "rb") as stream:
+                    report = importer.run(stream, format)
+        except UnicodeDecodeError as error:
+            raise CommandError(f"{file} is not UTF-8: {error}")
+        finally:
+            if rejects_file:
+                rejects_file.close()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {report.rows} rows: {report.created} created, {report.updated} updated, "
+                f"{report.unchanged} unchanged, {report.rejected} rejected"
+            )
+        )
@@ -0,0 +1,11 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from my_django_project.profiling import profile_token
+
+
+class Command(BaseCommand):
+    help = "Print a header that makes the server profile a request, valid for PROFILING_TOKEN_MAX_AGE seconds."
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{settings.PROFILING_HEADER}: {profile_token()}")
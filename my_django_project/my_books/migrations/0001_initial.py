@@ -0,0 +1,24 @@
+# Generated by Django 3.2.25 on 2026-10-18 06:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Book',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=64)),
+                ('author', models.CharField(max_length=64)),
+                ('pages', models.IntegerField()),
+                ('language', models.CharField(choices=[('EN', 'english'), ('PT', 'portuguese'), ('DE', 'german'), ('JP', 'japanese'), ('FR', 'french'), ('SP', 'spanish'), ('GR', 'greek'), ('AR', 'arabic'), ('NL', 'dutch'), ('ZH', 'chinese'), ('LA', 'latin'), ('SE', 'serbian'), ('IT', 'italian'), ('RU', 'russian'), ('MA', 'malay'), ('GA', 'galician'), ('WL', 'welsh'), ('SW', 'swedish'), ('NO', 'norwegian'), ('TU', 'turkish'), ('GL', 'gaelic'), ('AL', 'aleut'), ('MU', 'multiple languages'), ('UN', 'unknown')], default='UN', max_length=2)),
+            ],
+        ),
+    ]
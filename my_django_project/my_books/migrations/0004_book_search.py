@@ -0,0 +1,14 @@
+from django.db import migrations
+
+import my_books.search
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('my_books', '0003_book_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(my_books.search.install, my_books.search.uninstall),
+    ]
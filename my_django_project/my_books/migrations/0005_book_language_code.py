@@ -0,0 +1,62 @@
+from django.db import migrations, models
+
+import my_books.fields
+import my_books.search
+
+
+def to_codes(apps, schema_editor):
+    Book = apps.get_model('my_books', 'Book')
+
+    # labels and codes alike; anything else keeps the 'UN' default
+    for code, label in Book._meta.get_field('language_code').flatchoices:
+        Book.objects.filter(language__in=[code, label]).update(language_code=code)
+
+
+def to_strings(apps, schema_editor):
+    Book = apps.get_model('my_books', 'Book')
+
+    for code, _ in Book._meta.get_field('language_code').flatchoices:
+        Book.objects.filter(language_code=code).update(language=code)
+
+
+class Migration(migrations.Migration):
+    """Store ``Book.language`` as a small integer, converting labels to codes.
+
+    The fixtures stored labels (``english``) where the choices are codes
+    (``EN``). The values are copied into a new column and the old one is
+    dropped, since neither database casts ``'EN'`` to an integer in place.
+    SQLite rebuilds the table on the way, so the search index is installed
+    again around it.
+    """
+
+    dependencies = [
+        ('my_books', '0004_book_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, my_books.search.install),
+        migrations.RemoveIndex(
+            model_name='book',
+            name='book_language_pages_idx',
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='language_code',
+            field=my_books.fields.LanguageField(choices=[('EN', 'english'), ('PT', 'portuguese'), ('DE', 'german'), ('JP', 'japanese'), ('FR', 'french'), ('SP', 'spanish'), ('GR', 'greek'), ('AR', 'arabic'), ('NL', 'dutch'), ('ZH', 'chinese'), ('LA', 'latin'), ('SE', 'serbian'), ('IT', 'italian'), ('RU', 'russian'), ('MA', 'malay'), ('GA', 'galician'), ('WL', 'welsh'), ('SW', 'swedish'), ('NO', 'norwegian'), ('TU', 'turkish'), ('GL', 'gaelic'), ('AL', 'aleut'), ('MU', 'multiple languages'), ('UN', 'unknown')], default='UN'),
+        ),
+        migrations.RunPython(to_codes, to_strings),
+        migrations.RemoveField(
+            model_name='book',
+            name='language',
+        ),
+        migrations.RenameField(
+            model_name='book',
+            old_name='language_code',
+            new_name='language',
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['language', 'pages'], name='book_language_pages_idx'),
+        ),
+        migrations.RunPython(my_books.search.install, migrations.RunPython.noop),
+    ]
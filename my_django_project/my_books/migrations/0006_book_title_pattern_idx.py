@@ -0,0 +1,28 @@
+from django.db import migrations
+
+CREATE = "CREATE INDEX IF NOT EXISTS book_title_pattern_idx ON my_books_book (title varchar_pattern_ops)"
+DROP = "DROP INDEX IF EXISTS book_title_pattern_idx"
+
+
+def run_on_postgresql(sql):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor == "postgresql":
+            schema_editor.execute(sql)
+
+    return run
+
+
+class Migration(migrations.Migration):
+    """Index titles for ``LIKE 'prefix%'`` on PostgreSQL.
+
+    Under a linguistic collation such as ``en_US.UTF-8``, ``book_title_idx``
+    serves ordering and equality but not prefix matches.
+    """
+
+    dependencies = [
+        ('my_books', '0005_book_language_code'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_on_postgresql(CREATE), run_on_postgresql(DROP)),
+    ]
@@ -1,5 +1,7 @@
 from django.db import models
 
+from .fields import LanguageField
+
 
 class Book(models.Model):
     """The book django model"""
@@ -8,6 +10,7 @@ class Book(models.Model):
     author = models.CharField(max_length=64)
     pages = models.IntegerField()
 
+    # stored by position (see ``LanguageField``): only ever append languages
     class AvailableLanguages(models.TextChoices):
         ENGLISH = "EN", "english"
         PORTUGUESE = "PT", "portuguese"
@@ -34,7 +37,15 @@ class Book(models.Model):
         MULTIPLE_LANGUAGES = "MU", "multiple languages"
         UNKNOWN = "UN", "unknown"
 
-    language = models.CharField(max_length=2, choices=AvailableLanguages.choices, default=AvailableLanguages.UNKNOWN)
+    language = LanguageField(choices=AvailableLanguages.choices, default=AvailableLanguages.UNKNOWN)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["title"], name="book_title_idx"),
+            models.Index(fields=["author"], name="book_author_idx"),
+            models.Index(fields=["language", "pages"], name="book_language_pages_idx"),
+        ]
 
     def __str__(self):
         return self.title
@@ -0,0 +1,26 @@
+from django.conf import settings
+
+from rest_framework.pagination import CursorPagination
+
+
+class BookCursorPagination(CursorPagination):
+    """Keyset pagination on the primary key with opaque next/previous cursors.
+
+    Every page is a ``WHERE id > <cursor> ORDER BY id LIMIT <size>`` query, so
+    deep pages cost the same as the first one. Pagination is opt-in: it only
+    kicks in when the request carries a ``cursor`` or ``page_size`` parameter,
+    plain requests keep the unpaginated list.
+    """
+
+    ordering = "id"
+    page_size = settings.BOOKS_PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = settings.BOOKS_MAX_PAGE_SIZE
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+
+        return super().paginate_queryset(queryset, request, view)
@@ -0,0 +1,21 @@
+from pathlib import Path
+
+from django.template import engines
+
+
+def prewarm_templates(using="books"):
+    """Compile every template in the ``DIRS`` of the ``using`` engine, and return their names.
+
+    With the cached loader the compiled templates are kept, so a worker that
+    calls this at start never compiles one while serving a request; a
+    preforking server that imports the application first shares them.
+    """
+    engine = engines[using]
+    names = []
+
+    for directory in map(Path, engine.dirs):
+        for path in sorted(directory.rglob("*.html")):
+            names.append(path.relative_to(directory).as_posix())
+            engine.get_template(names[-1])
+
+    return names
@@ -0,0 +1,57 @@
+from graphene.utils.str_converters import to_snake_case
+from graphql.language import ast
+
+
+def _fields(selections, info):
+    """Yield the field nodes of ``selections``, expanding fragments."""
+    for selection in selections:
+        if isinstance(selection, ast.Field):
+            yield selection
+        elif isinstance(selection, ast.FragmentSpread):
+            yield from _fields(info.fragments[selection.name.value].selection_set.selections, info)
+        elif isinstance(selection, ast.InlineFragment):
+            yield from _fields(selection.selection_set.selections, info)
+
+
+def selected_fields(info, *path):
+    """Return the snake_case names selected under ``path`` of the field being resolved.
+
+    ``selected_fields(info, "edges", "node")`` on ``allBooks { edges { node { title } } }``
+    returns ``{"title"}``. Introspection fields such as ``__typename`` are skipped.
+    """
+    selections = [
+        selection
+        for field_ast in info.field_asts
+        if field_ast.selection_set
+        for selection in field_ast.selection_set.selections
+    ]
+
+    for name in path:
+        selections = [
+            selection
+            for field in _fields(selections, info)
+            if field.name.value == name and field.selection_set
+            for selection in field.selection_set.selections
+        ]
+
+    return {
+        to_snake_case(field.name.value)
+        for field in _fields(selections, info)
+        if not field.name.value.startswith("__")
+    }
+
+
+def project(queryset, names, *keys):
+    """Load only the ``names`` columns of ``queryset``, plus the ``keys`` it is paginated on.
+
+    When every name is a concrete model field the rows are fetched as
+    ``.values()`` dicts, skipping model instantiation altogether; otherwise
+    the model is kept and the query narrowed with ``.only()``.
+    """
+    concrete = {field.attname for field in queryset.model._meta.concrete_fields}
+    columns = [name for name in (*keys, *sorted(names)) if name in concrete]
+
+    if names <= concrete:
+        return queryset.values(*dict.fromkeys(columns))
+
+    return queryset.only(*columns)
@@ -1,37 +1,178 @@
+from django.conf import settings
 from django.forms import ModelForm
 
-from graphene import ObjectType, Schema, Field, Int, String
-from graphene_django import DjangoObjectType, DjangoListField
+from graphene import (
+    ID,
+    Field,
+    InputObjectType,
+    Int,
+    List,
+    Mutation,
+    NonNull,
+    ObjectType,
+    Schema,
+    String,
+    relay,
+)
+from graphene_django import DjangoObjectType
+from graphene_django.converter import convert_django_field
 from graphene_django.rest_framework.mutation import SerializerMutation
 from graphene_django_cud.mutations import (
     DjangoCreateMutation,
     DjangoPatchMutation,
     DjangoDeleteMutation,
 )
+from graphql import GraphQLError
+from graphql_relay.connection.arrayconnection import cursor_to_offset, offset_to_cursor
+from graphql_relay.utils import base64, unbase64
 
+from .bulk import create_books, update_books, delete_books
+from .fields import LanguageField
+from .loaders import get_book_loader
 from .models import Book
+from .projection import project, selected_fields
+from .search import search_books
 from .serializers import BookSerializer
 
 
+@convert_django_field.register(LanguageField)
+def convert_language_field(field, registry=None):
+    # clients see the codes, never the stored integers
+    return String(description=field.help_text, required=not field.null)
+
+
 class BookType(DjangoObjectType):
     class Meta:
         model = Book
         convert_choices_to_enum = False
 
+    @classmethod
+    def is_type_of(cls, root, info):
+        # projected queries resolve books as ``.values()`` dicts
+        return isinstance(root, dict) or super().is_type_of(root, info)
+
+    def resolve_id(self, info):
+        return self["id"] if isinstance(self, dict) else self.pk
+
+
+class BookConnection(relay.Connection):
+    class Meta:
+        node = BookType
+
+
+def to_cursor(pk):
+    return base64(f"book:{pk}")
+
+
+def from_cursor(cursor):
+    try:
+        prefix, _, pk = unbase64(cursor).partition(":")
+    except ValueError:
+        prefix, pk = None, ""
+
+    if prefix != "book" or not pk.isdigit():
+        raise GraphQLError("Invalid cursor")
+
+    return int(pk)
+
+
+def page_size(first):
+    """Return ``first`` defaulted to ``BOOKS_PAGE_SIZE`` and capped to ``BOOKS_MAX_PAGE_SIZE``."""
+    if first is None:
+        return settings.BOOKS_PAGE_SIZE
+
+    if first < 0:
+        raise GraphQLError("Argument 'first' must be a non-negative integer")
+
+    return min(first, settings.BOOKS_MAX_PAGE_SIZE)
+
+
+def paginate_books(queryset, first=None, after=None):
+    """Slice ``queryset`` into a ``BookConnection`` page keyed on ``id``.
+
+    Pages are ``WHERE id > <after> ORDER BY id LIMIT <first>`` queries, and
+    ``first`` is capped to ``BOOKS_MAX_PAGE_SIZE``. ``queryset`` may yield
+    model instances or ``.values()`` dicts.
+    """
+    first = page_size(first)
+    queryset = queryset.order_by("id")
+
+    if after is not None:
+        queryset = queryset.filter(id__gt=from_cursor(after))
+
+    books = list(queryset[: first + 1])
+    edges = [
+        BookConnection.Edge(
+            node=book,
+            cursor=to_cursor(book["id"] if isinstance(book, dict) else book.id),
+        )
+        for book in books[:first]
+    ]
+
+    return BookConnection(
+        edges=edges,
+        page_info=relay.PageInfo(
+            start_cursor=edges[0].cursor if edges else None,
+            end_cursor=edges[-1].cursor if edges else None,
+            has_previous_page=after is not None,
+            has_next_page=len(books) > first,
+        ),
+    )
+
+
+def search_connection(query, first=None, after=None):
+    """Return one ranked ``BookConnection`` page of the full-text search for ``query``.
+
+    Ranks are not stable keys, so the cursors here are plain offsets.
+    """
+    first = page_size(first)
+    offset = 0
+
+    if after is not None:
+        if (position := cursor_to_offset(after)) is None:
+            raise GraphQLError("Invalid cursor")
+
+        offset = position + 1
+
+    rows, has_next = search_books(query, offset, first)
+    edges = [
+        BookConnection.Edge(node=row, cursor=offset_to_cursor(offset + index))
+        for index, row in enumerate(rows)
+    ]
+
+    return BookConnection(
+        edges=edges,
+        page_info=relay.PageInfo(
+            start_cursor=edges[0].cursor if edges else None,
+            end_cursor=edges[-1].cursor if edges else None,
+            has_previous_page=offset > 0,
+            has_next_page=has_next,
+        ),
+    )
+
 
 class BookQuery(ObjectType):
     book = Field(BookType, id=Int(), title=String())
-    all_books = DjangoListField(BookType)
+    all_books = Field(BookConnection, first=Int(), after=String())
+    search_books = Field(BookConnection, query=String(required=True), first=Int(), after=String())
 
     def resolve_book(self, info, **kwargs):
-        if _id := kwargs.get("id") is not None:
-            return Book.objects.get(pk=_id)
+        if (_id := kwargs.get("id")) is not None:
+            return get_book_loader(info).load(("id", _id))
 
-        if title := kwargs.get("title") is not None:
-            return Book.objects.get(title=title)
+        if (title := kwargs.get("title")) is not None:
+            return get_book_loader(info).load(("title", title))
 
         return None
 
+    def resolve_all_books(self, info, first=None, after=None):
+        books = project(Book.objects.all(), selected_fields(info, "edges", "node"), "id")
+
+        return paginate_books(books, first, after)
+
+    def resolve_search_books(self, info, query, first=None, after=None):
+        return search_connection(query, first, after)
+
 
 class CreateBookMutation(DjangoCreateMutation):
     class Meta:
@@ -41,6 +182,7 @@ class CreateBookMutation(DjangoCreateMutation):
 class UpdateBookMutation(DjangoPatchMutation):
     class Meta:
         model = Book
+        exclude_fields = ("updated_at",)
 
 
 class DeleteBookMutation(DjangoDeleteMutation):
@@ -48,10 +190,81 @@ class DeleteBookMutation(DjangoDeleteMutation):
         model = Book
 
 
+class BulkCreateBookInput(InputObjectType):
+    title = String(required=True)
+    author = String(required=True)
+    pages = Int(required=True)
+    language = String()
+
+
+class BulkPatchBookInput(InputObjectType):
+    id = ID(required=True)
+    title = String()
+    author = String()
+    pages = Int()
+    language = String()
+
+
+class BulkError(ObjectType):
+    index = Int(required=True)
+    field = String(required=True)
+    messages = List(NonNull(String), required=True)
+
+
+def bulk_errors(errors):
+    return [
+        BulkError(index=index, field=field, messages=[str(message) for message in messages])
+        for index, fields in errors.items()
+        for field, messages in fields.items()
+    ]
+
+
+class CreateBooksMutation(Mutation):
+    class Arguments:
+        input = List(NonNull(BulkCreateBookInput), required=True)
+
+    books = List(NonNull(BookType), required=True)
+    errors = List(NonNull(BulkError), required=True)
+
+    @classmethod
+    def mutate(cls, root, info, input):
+        books, errors = create_books([dict(item) for item in input])
+        return cls(books=books, errors=bulk_errors(errors))
+
+
+class UpdateBooksMutation(Mutation):
+    class Arguments:
+        input = List(NonNull(BulkPatchBookInput), required=True)
+
+    books = List(NonNull(BookType), required=True)
+    errors = List(NonNull(BulkError), required=True)
+
+    @classmethod
+    def mutate(cls, root, info, input):
+        books, errors = update_books([dict(item) for item in input])
+        return cls(books=books, errors=bulk_errors(errors))
+
+
+class DeleteBooksMutation(Mutation):
+    class Arguments:
+        ids = List(NonNull(ID), required=True)
+
+    deleted_ids = List(NonNull(ID), required=True)
+    errors = List(NonNull(BulkError), required=True)
+
+    @classmethod
+    def mutate(cls, root, info, ids):
+        deleted_ids, errors = delete_books(ids)
+        return cls(deleted_ids=deleted_ids, errors=bulk_errors(errors))
+
+
 class Mutations(ObjectType):
     create_book = CreateBookMutation.Field()
     update_book = UpdateBookMutation.Field()
     delete_book = DeleteBookMutation.Field()
+    create_books = CreateBooksMutation.Field()
+    update_books = UpdateBooksMutation.Field()
+    delete_books = DeleteBooksMutation.Field()
 
 
 schema = Schema(query=BookQuery, mutation=Mutations)
@@ -0,0 +1,135 @@
+import re
+
+from django.db import connection
+
+from .cache import book_cache
+
+# PostgreSQL: a weighted ``tsvector`` column kept up to date by a trigger and
+# indexed with GIN. The column is maintained in SQL only, so the model and the
+# SQLite setups never need ``django.contrib.postgres`` (and psycopg2).
+
+POSTGRESQL_INSTALL = [
+    "ALTER TABLE my_books_book ADD COLUMN IF NOT EXISTS search_vector tsvector",
+    """
+    CREATE OR REPLACE FUNCTION my_books_book_search_vector() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('pg_catalog.simple', coalesce(NEW.title, '')), 'A') ||
+            setweight(to_tsvector('pg_catalog.simple', coalesce(NEW.author, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS my_books_book_search_vector ON my_books_book",
+    """
+    CREATE TRIGGER my_books_book_search_vector
+    BEFORE INSERT OR UPDATE OF title, author ON my_books_book
+    FOR EACH ROW EXECUTE PROCEDURE my_books_book_search_vector()
+    """,
+    "UPDATE my_books_book SET title = title",
+    "CREATE INDEX IF NOT EXISTS book_search_vector_idx ON my_books_book USING gin (search_vector)",
+]
+
+POSTGRESQL_UNINSTALL = [
+    "DROP TRIGGER IF EXISTS my_books_book_search_vector ON my_books_book",
+    "DROP FUNCTION IF EXISTS my_books_book_search_vector()",
+    "ALTER TABLE my_books_book DROP COLUMN IF EXISTS search_vector",
+]
+
+POSTGRESQL_SEARCH = """
+    SELECT id FROM my_books_book, plainto_tsquery('pg_catalog.simple', %s) query
+    WHERE search_vector @@ query
+    ORDER BY ts_rank(search_vector, query) DESC, id
+    LIMIT %s OFFSET %s
+"""
+
+# SQLite: an external-content FTS5 table over the book table, kept in sync by
+# triggers. Table rebuilds in later migrations drop the triggers, so those
+# migrations must run ``install`` again; every statement is idempotent.
+
+SQLITE_INSTALL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS my_books_book_fts USING fts5(
+        title, author, content='my_books_book', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS my_books_book_fts_insert AFTER INSERT ON my_books_book BEGIN
+        INSERT INTO my_books_book_fts(rowid, title, author) VALUES (new.id, new.title, new.author);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS my_books_book_fts_delete AFTER DELETE ON my_books_book BEGIN
+        INSERT INTO my_books_book_fts(my_books_book_fts, rowid, title, author)
+        VALUES ('delete', old.id, old.title, old.author);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS my_books_book_fts_update AFTER UPDATE OF title, author ON my_books_book BEGIN
+        INSERT INTO my_books_book_fts(my_books_book_fts, rowid, title, author)
+        VALUES ('delete', old.id, old.title, old.author);
+        INSERT INTO my_books_book_fts(rowid, title, author) VALUES (new.id, new.title, new.author);
+    END
+    """,
+    "INSERT INTO my_books_book_fts(my_books_book_fts) VALUES ('rebuild')",
+]
+
+SQLITE_UNINSTALL = [
+    "DROP TRIGGER IF EXISTS my_books_book_fts_insert",
+    "DROP TRIGGER IF EXISTS my_books_book_fts_delete",
+    "DROP TRIGGER IF EXISTS my_books_book_fts_update",
+    "DROP TABLE IF EXISTS my_books_book_fts",
+]
+
+# titles weigh twice as much as authors, like the 'A'/'B' weights above
+SQLITE_SEARCH = """
+    SELECT rowid FROM my_books_book_fts WHERE my_books_book_fts MATCH %s
+    ORDER BY bm25(my_books_book_fts, 2.0, 1.0), rowid
+    LIMIT %s OFFSET %s
+"""
+
+
+def install(apps, schema_editor):
+    """Create the text index of the current database; a ``RunPython`` callable."""
+    statements = POSTGRESQL_INSTALL if schema_editor.connection.vendor == "postgresql" else SQLITE_INSTALL
+
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def uninstall(apps, schema_editor):
+    statements = POSTGRESQL_UNINSTALL if schema_editor.connection.vendor == "postgresql" else SQLITE_UNINSTALL
+
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def match_expression(query):
+    """Turn free text into an FTS5 query matching every word, quoting away its syntax."""
+    return " ".join(f'"{word}"' for word in re.findall(r"\w+", query))
+
+
+def search_ids(query, offset, limit):
+    """Return the ids of the books matching ``query``, best match first."""
+    if connection.vendor == "postgresql":
+        sql, params = POSTGRESQL_SEARCH, [query, limit, offset]
+    elif match := match_expression(query):
+        sql, params = SQLITE_SEARCH, [match, limit, offset]
+    else:
+        return []
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [pk for pk, in cursor.fetchall()]
+
+
+def search_books(query, offset, limit):
+    """Return ``(rows, has_next)``: one ranked page of book rows matching ``query``.
+
+    The index only yields ids; the rows themselves come through ``book_cache``.
+    """
+    ids = search_ids(query, offset, limit + 1)
+    rows = book_cache.rows(ids[:limit])
+
+    return [rows[pk] for pk in ids[:limit] if pk in rows], len(ids) > limit
@@ -1,3 +1,5 @@
+from rest_framework.exceptions import ValidationError
+from rest_framework.fields import CharField, ChoiceField, IntegerField
 from rest_framework.serializers import ModelSerializer
 
 from .models import Book
@@ -6,4 +8,51 @@ from .models import Book
 class BookSerializer(ModelSerializer):
     class Meta:
         model = Book
-        fields = "__all__"
+        exclude = ("updated_at",)
+
+
+class BookFastSerializer:
+    """Read-only twin of ``BookSerializer`` for list and retrieve responses.
+
+    Rows come straight from ``.values()`` instead of model instances, and the
+    per-field ``to_representation`` calls are resolved once: fields whose
+    representation is the stored value itself are passed through untouched,
+    only the others keep their converter. ``fields`` narrows the output to a
+    sparse fieldset.
+    """
+
+    serializer_class = BookSerializer
+    passthrough_fields = (CharField, ChoiceField, IntegerField)
+
+    def __init__(self, fields=None):
+        declared = self.serializer_class().fields
+
+        if fields is not None:
+            if unknown := set(fields) - set(declared):
+                raise ValidationError({"fields": [f"Unknown field: {name}" for name in sorted(unknown)]})
+
+            declared = {name: field for name, field in declared.items() if name in fields}
+
+        self.field_names = tuple(declared)
+        self.converters = tuple(
+            (name, field.to_representation)
+            for name, field in declared.items()
+            if type(field) not in self.passthrough_fields
+        )
+
+    def values(self, queryset, *keys):
+        """Select the serialized fields, plus the ``keys`` a paginator needs to read."""
+        return queryset.values(*dict.fromkeys((*self.field_names, *keys)))
+
+    def to_representation(self, row):
+        if len(row) != len(self.field_names):
+            row = {name: row[name] for name in self.field_names}
+
+        for name, convert in self.converters:
+            if (value := row[name]) is not None:
+                row[name] = convert(value)
+
+        return row
+
+    def serialize(self, rows):
+        return [self.to_representation(row) for row in rows]
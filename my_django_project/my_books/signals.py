@@ -0,0 +1,18 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .cache import book_cache
+from .models import Book
+
+
+@receiver(pre_save, sender=Book)
+def stamp_raw_book(sender, instance, raw, **kwargs):
+    # raw saves (loaddata) skip auto_now, and fixtures carry no updated_at
+    if raw and instance.updated_at is None:
+        instance.updated_at = timezone.now()
+
+
+@receiver([post_save, post_delete], sender=Book)
+def invalidate_book_cache(sender, instance, **kwargs):
+    book_cache.invalidate(instance.pk)
@@ -0,0 +1,50 @@
+import json
+from itertools import islice
+
+from django.http import StreamingHttpResponse
+
+from rest_framework.utils.encoders import JSONEncoder
+
+
+def dumps(data):
+    """Encode ``data`` the same way DRF's ``JSONRenderer`` does."""
+    return json.dumps(data, cls=JSONEncoder, ensure_ascii=False, separators=(",", ":"))
+
+
+def chunked(queryset, chunk_size):
+    """Yield lists of at most ``chunk_size`` rows read through a server-side cursor."""
+    rows = queryset.iterator(chunk_size=chunk_size)
+
+    while chunk := list(islice(rows, chunk_size)):
+        yield chunk
+
+
+def stream_json(chunks):
+    """Yield the rows of every chunk as the pieces of one JSON array."""
+    separator = "["
+
+    for chunk in chunks:
+        yield separator + ",".join(map(dumps, chunk))
+        separator = ","
+
+    yield "[]" if separator == "[" else "]"
+
+
+def stream_ndjson(chunks):
+    """Yield the rows of every chunk as newline delimited JSON."""
+    for chunk in chunks:
+        yield "".join(dumps(row) + "\n" for row in chunk)
+
+
+def export_response(queryset, serialize, chunk_size, ndjson=False):
+    """Stream ``queryset`` through ``serialize``, one chunk of rows at a time.
+
+    Only one chunk of rows and its JSON text are alive at any time, so memory
+    stays bounded however many rows the queryset holds.
+    """
+    chunks = (serialize(chunk) for chunk in chunked(queryset, chunk_size))
+
+    if ndjson:
+        return StreamingHttpResponse(stream_ndjson(chunks), content_type="application/x-ndjson")
+
+    return StreamingHttpResponse(stream_json(chunks), content_type="application/json")
@@ -1,22 +1,69 @@
+import asyncio
+import json
+import os
+import pstats
 from collections import OrderedDict
-
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from io import StringIO
+from pathlib import Path
+from types import SimpleNamespace
+
+import psycopg2
+import psycopg2.extras
 import pytest
-
-from django.test import Client
+import yaml
+from asgiref.sync import async_to_sync
+
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.db.models import Count, Q, Sum
+from django.template import engines
+from django.template.backends.django import DjangoTemplates
+from django.test import AsyncClient, Client, RequestFactory
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.forms.models import model_to_dict
+from django.http import Http404
 
+from rest_framework.pagination import Cursor
+from rest_framework.renderers import JSONRenderer
 from rest_framework.status import *
 from rest_framework.test import APIClient
 
 from graphene.test import Client as GrapheneClient
+from graphql.backend import GraphQLCoreBackend
 
+from my_django_project.instrumentation import registry
+from my_django_project.middleware import timing_report, timing_report_view, timings
+from my_django_project.postgresql.base import DatabaseWrapper as PostgresWrapper
+from my_django_project.profiling import profile_token
+
+from .cache import book_cache
+from .filters import BookFilterBackend, prefix_range
+from .graphql_views import CachedDocumentBackend, query_hash
+from .importers import BookImporter
 from .models import Book
-from .schema import schema
+from .pagination import BookCursorPagination
+from .prewarm import prewarm_templates
+from .schema import schema, to_cursor
+from .search import search_books
+from .serializers import BookSerializer, BookFastSerializer
 
 # fixtures
 
 
+@pytest.fixture(autouse=True)
+def clear_book_cache(monkeypatch):
+    """Cache books, safe in one process, without leaking rows between tests that reuse primary keys."""
+    monkeypatch.setattr(book_cache, "enabled", True)
+    book_cache.clear()
+    yield
+    book_cache.clear()
+
+
 @pytest.fixture
 def books():
     return Book.objects.bulk_create(
@@ -24,31 +71,110 @@ def books():
             Book(
                 title="Moby Dick",
                 author="Herman Melville",
-                language="english",
+                language="EN",
                 pages=677,
             ),
             Book(
                 title="As Crônicas de Nárnia",
                 author="C. S. Lewis",
-                language="portuguese",
+                language="PT",
                 pages=752,
             ),
             Book(
                 title="Harry Potter und Der Stein der Weisen",
                 author="J. K. Rowling",
-                language="german",
+                language="DE",
                 pages=337,
             ),
             Book(
                 title="羊をめぐる冒険",
                 author="Haruki Murakami",
-                language="japanese",
+                language="JP",
                 pages=331,
             ),
         ]
     )
 
 
+@pytest.fixture
+def many_books():
+    languages = Book.AvailableLanguages.values
+
+    return Book.objects.bulk_create(
+        Book(
+            id=pk,
+            title=f"Book {pk}",
+            author=f"Author {pk % 100}",
+            language=languages[pk % len(languages)],
+            pages=pk % 1000,
+        )
+        for pk in range(1, 10_001)
+    )
+
+
+@lru_cache(maxsize=None)
+def read_catalogue():
+    with open(Path(__file__).parent / "fixtures" / "books.yaml", "rb") as stream:
+        return yaml.load(stream, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
+
+
+@pytest.fixture
+def catalogue():
+    """The full ``books.yaml`` dataset, parsed once per session."""
+    return Book.objects.bulk_create(Book(pk=obj["pk"], **obj["fields"]) for obj in read_catalogue())
+
+
+# helpers
+
+
+def execute_gql(client, query, num_queries, **kwargs):
+    """Execute ``query`` in a fresh request context and assert how many SQL queries it runs."""
+    context = RequestFactory().post("/graphql/")
+
+    with CaptureQueriesContext(connection) as queries:
+        result = client.execute(query, context_value=context, **kwargs)
+
+    assert len(queries) == num_queries, [query["sql"] for query in queries]
+
+    return result
+
+
+def get_async(url):
+    """GET ``url`` through the ASGI handler.
+
+    The query string must be part of ``url``: the Django 3.2 ``AsyncClient``
+    drops query dicts.
+    """
+
+    async def get():
+        return await AsyncClient().get(url)
+
+    return async_to_sync(get)()
+
+
+def explain(queryset):
+    """Return the query plan of ``queryset``.
+
+    PostgreSQL prefers a sequential scan on small tables whatever the indexes,
+    so it is disabled here: the planner falls back to one only when no index
+    can serve the query.
+    """
+    if connection.vendor != "postgresql":
+        return queryset.explain()
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("SET LOCAL enable_seqscan = off")
+        return queryset.explain()
+
+
+def assert_no_sequential_scan(queryset):
+    """Fail if the plan of ``queryset`` reads a whole table or index."""
+    plan = explain(queryset)
+    marker = "Seq Scan" if connection.vendor == "postgresql" else "SCAN "
+
+    assert marker not in plan, f"{queryset.query}\n{plan}"
+
+
 @pytest.mark.django_db
 class TestBooksServerSide:
     def test_create_server_side(self, benchmark):
@@ -83,7 +209,7 @@ class TestBooksServerSide:
             "id": 1,
             "title": "Moby Dick",
             "author": "Herman Melville",
-            "language": "english",
+            "language": "EN",
             "pages": 677,
         }
 
@@ -102,28 +228,28 @@ class TestBooksServerSide:
                 "id": 1,
                 "title": "Moby Dick",
                 "author": "Herman Melville",
-                "language": "english",
+                "language": "EN",
                 "pages": 677,
             },
             {
                 "id": 2,
                 "title": "As Crônicas de Nárnia",
                 "author": "C. S. Lewis",
-                "language": "portuguese",
+                "language": "PT",
                 "pages": 752,
             },
             {
                 "id": 3,
                 "title": "Harry Potter und Der Stein der Weisen",
                 "author": "J. K. Rowling",
-                "language": "german",
+                "language": "DE",
                 "pages": 337,
             },
             {
                 "id": 4,
                 "title": "羊をめぐる冒険",
                 "author": "Haruki Murakami",
-                "language": "japanese",
+                "language": "JP",
                 "pages": 331,
             },
         ]
@@ -131,7 +257,115 @@ class TestBooksServerSide:
         response = benchmark(client.get, url)
 
         assert response.status_code is HTTP_200_OK
-        assert context == list(response.context["books"].values())
+        assert list(response.context["book_ids"]) == [book["id"] for book in context]
+
+        html = response.content.decode()
+        for book in context:
+            assert f"<td>{book['title']}</td>" in html
+            assert f"<td>{book['language']}</td>" in html
+
+    def test_paginate_server_side(self, many_books):
+        """Ensure the book list is rendered one page at a time: GET /books/?page=2"""
+        client = Client()
+
+        url = reverse("book-list")
+        response = client.get(url, {"page": 2})
+
+        assert response.status_code is HTTP_200_OK
+        assert list(response.context["book_ids"]) == list(range(101, 201))
+        assert response.content.decode().count(">update</a>") == 100
+        assert '<a href="?page=3">next</a>' in response.content.decode()
+
+        response = client.get(url, {"page": 1000})
+        assert response.status_code == HTTP_404_NOT_FOUND
+
+    def test_row_fragments_server_side(self, books):
+        """Ensure warm pages reuse the rendered rows, until the book changes."""
+        client = Client()
+
+        url = reverse("book-list")
+        client.get(url)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+
+        # the etag, the page count and the page ids: no rows are read
+        assert len(queries) == 3, [query["sql"] for query in queries]
+
+        Book.objects.filter(pk=1).update(title="Moby-Dick")
+        assert "Moby-Dick" not in client.get(url).content.decode()
+
+        Book.objects.get(pk=1).save()
+        assert "<td>Moby-Dick</td>" in client.get(url).content.decode()
+
+    @pytest.mark.benchmark(group="read-page-server-side")
+    @pytest.mark.parametrize("fragments", ["warm", "cold"])
+    def test_read_page_server_side(self, benchmark, catalogue, fragments):
+        """Benchmark rendering one page of the full books.yaml dataset, with and without cached rows."""
+        client = Client()
+
+        url = reverse("book-list")
+        client.get(url, {"page": 2})
+
+        setup = book_cache.clear if fragments == "cold" else None
+        response = benchmark.pedantic(client.get, args=(url, {"page": 2}), setup=setup, rounds=20)
+
+        assert response.status_code is HTTP_200_OK
+
+    def test_conditional_read_server_side(self, books):
+        """Ensure book pages answer 304 until the book changes."""
+        client = Client()
+
+        for url in (reverse("book-read", kwargs={"pk": 1}), reverse("book-list")):
+            response = client.get(url)
+            assert response.status_code is HTTP_200_OK
+
+            response = client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+            assert response.status_code == HTTP_304_NOT_MODIFIED
+
+        url = reverse("book-read", kwargs={"pk": 1})
+        response = client.get(url, HTTP_IF_MODIFIED_SINCE=client.get(url)["Last-Modified"])
+        assert response.status_code == HTTP_304_NOT_MODIFIED
+
+        etag = client.get(reverse("book-list"))["ETag"]
+        Book.objects.get(pk=2).delete()
+        assert client.get(reverse("book-list"), HTTP_IF_NONE_MATCH=etag).status_code is HTTP_200_OK
+
+    def test_prewarm_templates(self):
+        """Ensure prewarming compiles every book template into the cached loader."""
+        names = prewarm_templates()
+
+        assert {"base.html", "my_books/book_list.html", "my_books/book_detail.html"} <= set(names)
+
+        loader = engines["books"].engine.template_loaders[0]
+        assert set(names) <= set(loader.get_template_cache)
+
+    @pytest.mark.benchmark(group="render-templates")
+    @pytest.mark.parametrize("profile", ["development", "production"])
+    def test_render_server_side(self, benchmark, settings, books, profile):
+        """Benchmark finding and rendering a book page with each template profile."""
+        loaders = ["django.template.loaders.filesystem.Loader"]
+        context_processors = settings.BOOKS_TEMPLATE_CONTEXT_PROCESSORS
+
+        if profile == "development":
+            context_processors = ["django.template.context_processors.debug", *settings.TEMPLATE_CONTEXT_PROCESSORS]
+        else:
+            loaders = [("django.template.loaders.cached.Loader", loaders)]
+
+        backend = DjangoTemplates(
+            {
+                "NAME": profile,
+                "DIRS": engines["books"].dirs,
+                "APP_DIRS": False,
+                "OPTIONS": {"loaders": loaders, "context_processors": context_processors},
+            }
+        )
+        request = RequestFactory().get(reverse("book-read", kwargs={"pk": 1}))
+
+        def render():
+            return backend.get_template("my_books/book_detail.html").render({"book": books[0]}, request)
+
+        assert "<dd>Moby Dick</dd>" in benchmark(render)
 
     def test_update_server_side(self, benchmark, books):
         """Ensure we can update a book."""
@@ -232,13 +466,60 @@ class TestBooksREST:
             "id": 1,
             "title": "Moby Dick",
             "author": "Herman Melville",
-            "language": "english",
+            "language": "EN",
             "pages": 677,
         }
 
         assert response.status_code is HTTP_200_OK
         assert response.json() == body
 
+    def test_read_one_rest_cached(self, benchmark, books):
+        """Ensure a cached book is retrieved without touching the database: GET /books/1"""
+        client = APIClient()
+
+        url = reverse("book-rest-detail", kwargs={"pk": 1})
+        client.get(url)  # warm the cache
+
+        with CaptureQueriesContext(connection) as queries:
+            response = benchmark(client.get, url)
+
+        assert response.status_code is HTTP_200_OK
+        assert response.json()["title"] == "Moby Dick"
+        assert len(queries) == 0
+        assert book_cache.stats()["hit_ratio"] > 0
+
+    def test_cache_invalidated_on_write_rest(self, books):
+        """Ensure writes drop the cached book and list responses."""
+        client = APIClient()
+
+        detail_url = reverse("book-rest-detail", kwargs={"pk": 1})
+        list_url = reverse("book-rest-list")
+        client.get(detail_url)
+        client.get(list_url)
+
+        client.patch(detail_url, {"pages": 1})
+        assert client.get(detail_url).json()["pages"] == 1
+        assert client.get(list_url).json()[0]["pages"] == 1
+
+        client.patch(reverse("book-rest-bulk"), [{"id": 1, "pages": 2}], format="json")
+        assert client.get(detail_url).json()["pages"] == 2
+        assert client.get(list_url).json()[0]["pages"] == 2
+
+        client.delete(detail_url)
+        assert client.get(detail_url).status_code == HTTP_404_NOT_FOUND
+        assert len(client.get(list_url).json()) == 3
+
+    def test_cached_read_filtered_rest(self, books):
+        """Ensure a cached book still answers the filters: GET /books/1/?language=PT"""
+        client = APIClient()
+
+        url = reverse("book-rest-detail", kwargs={"pk": 1})
+        assert client.get(url, {"language": "PT"}).status_code == HTTP_404_NOT_FOUND
+
+        client.get(url)  # warm the cache
+        assert client.get(url, {"language": "PT"}).status_code == HTTP_404_NOT_FOUND
+        assert client.get(url, {"language": "EN"}).json()["title"] == "Moby Dick"
+
     def test_read_all_rest(self, benchmark, books):
         """Ensure we can list all books: GET /books/"""
         client = APIClient()
@@ -251,28 +532,28 @@ class TestBooksREST:
                 "id": 1,
                 "title": "Moby Dick",
                 "author": "Herman Melville",
-                "language": "english",
+                "language": "EN",
                 "pages": 677,
             },
             {
                 "id": 2,
                 "title": "As Crônicas de Nárnia",
                 "author": "C. S. Lewis",
-                "language": "portuguese",
+                "language": "PT",
                 "pages": 752,
             },
             {
                 "id": 3,
                 "title": "Harry Potter und Der Stein der Weisen",
                 "author": "J. K. Rowling",
-                "language": "german",
+                "language": "DE",
                 "pages": 337,
             },
             {
                 "id": 4,
                 "title": "羊をめぐる冒険",
                 "author": "Haruki Murakami",
-                "language": "japanese",
+                "language": "JP",
                 "pages": 331,
             },
         ]
@@ -280,6 +561,349 @@ class TestBooksREST:
         assert response.status_code is HTTP_200_OK
         assert response.json() == body
 
+    def test_conditional_read_one_rest(self, books):
+        """Ensure a book answers 304 until it is updated: GET /books/1"""
+        client = APIClient()
+
+        url = reverse("book-rest-detail", kwargs={"pk": 1})
+        response = client.get(url)
+        etag = response["ETag"]
+
+        assert response.has_header("Last-Modified")
+        assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == HTTP_304_NOT_MODIFIED
+        assert client.get(url + "?fields=title", HTTP_IF_NONE_MATCH=etag).status_code is HTTP_200_OK
+
+        client.patch(url, {"pages": 1})
+        assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code is HTTP_200_OK
+
+    def test_conditional_read_all_rest(self, benchmark, books):
+        """Ensure revalidating the list costs one query and no serialization: GET /books/"""
+        client = APIClient()
+
+        url = reverse("book-rest-list")
+        etag = client.get(url)["ETag"]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = benchmark(client.get, url, HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == HTTP_304_NOT_MODIFIED
+        assert not response.content
+        assert len(queries) == 1
+
+        client.patch(reverse("book-rest-bulk"), [{"id": 3, "pages": 1}], format="json")
+        assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code is HTTP_200_OK
+
+    def test_conditional_paginate_rest(self, books):
+        """Ensure a page revalidates from its own rows only: GET /books/?page_size=2"""
+        client = APIClient()
+
+        url = reverse("book-rest-list")
+        first = client.get(url, {"page_size": 2})
+        second = client.get(url, {"page_size": 2, "ordering": "-id"})
+
+        def revalidate(response, **params):
+            return client.get(url, {"page_size": 2, **params}, HTTP_IF_NONE_MATCH=response["ETag"]).status_code
+
+        client.patch(reverse("book-rest-detail", kwargs={"pk": 3}), {"pages": 1})
+        assert revalidate(first) == HTTP_304_NOT_MODIFIED
+
+        with CaptureQueriesContext(connection) as queries:
+            assert revalidate(second, ordering="-id") is HTTP_200_OK
+        assert "COUNT" not in " ".join(query["sql"] for query in queries)
+
+        client.delete(reverse("book-rest-detail", kwargs={"pk": 2}))
+        assert revalidate(first) is HTTP_200_OK
+
+    def test_paginate_rest(self, books):
+        """Ensure we can walk the book list with cursors: GET /books/?page_size=2"""
+        client = APIClient()
+
+        url = reverse("book-rest-list")
+        first_page = client.get(url, {"page_size": 2}).json()
+
+        assert [book["id"] for book in first_page["results"]] == [1, 2]
+        assert first_page["previous"] is None
+
+        second_page = client.get(first_page["next"]).json()
+
+        assert [book["id"] for book in second_page["results"]] == [3, 4]
+        assert second_page["next"] is None
+
+        previous_page = client.get(second_page["previous"]).json()
+
+        assert previous_page["results"] == first_page["results"]
+
+    @pytest.mark.benchmark(group="read-all-rest-paginated")
+    @pytest.mark.parametrize("table_size", [1_000, 10_000])
+    def test_read_all_rest_large_table(self, benchmark, table_size):
+        """Ensure the last page, its etag included, costs the same on any table size: GET /books/?cursor=..."""
+        client = APIClient()
+
+        Book.objects.bulk_create(
+            Book(id=pk, title=f"Book {pk}", author="Author", language="EN", pages=pk)
+            for pk in range(1, table_size + 1)
+        )
+
+        page_size = 100
+
+        paginator = BookCursorPagination()
+        paginator.base_url = f"{reverse('book-rest-list')}?page_size={page_size}"
+        url = paginator.encode_cursor(
+            Cursor(offset=0, reverse=False, position=table_size - page_size)
+        )
+
+        # time the keyset query, not list cache hits
+        response = benchmark.pedantic(client.get, args=(url,), setup=book_cache.clear, rounds=20)
+        page = response.json()
+
+        assert response.status_code is HTTP_200_OK
+        assert len(page["results"]) == page_size
+        assert page["results"][-1]["id"] == table_size
+        assert page["next"] is None
+
+    def test_sparse_fieldset_rest(self, books):
+        """Ensure we can pick the fields we read: GET /books/?fields=title,author"""
+        client = APIClient()
+
+        url = reverse("book-rest-list")
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url, {"fields": "title,author", "page_size": 1})
+
+        assert response.status_code is HTTP_200_OK
+        assert response.json()["results"] == [
+            {"title": "Moby Dick", "author": "Herman Melville"}
+        ]
+        assert '"pages"' not in queries[0]["sql"]
+
+        url = reverse("book-rest-detail", kwargs={"pk": 2})
+        response = client.get(url, {"fields": "language"})
+
+        assert response.json() == {"language": "PT"}
+
+    def test_unknown_sparse_field_failure(self, books):
+        """Ensure unknown fields are rejected: GET /books/?fields=isbn"""
+        client = APIClient()
+
+        url = reverse("book-rest-list")
+        response = client.get(url, {"fields": "title,isbn"})
+
+        assert response.status_code is HTTP_400_BAD_REQUEST
+        assert response.json() == {"fields": ["Unknown field: isbn"]}
+
+    def test_filter_rest(self, books):
+        """Ensure lists are filtered in SQL: GET /books/?author=...&language=...&search=..."""
+        client = APIClient()
+
+        def ids(**params):
+            return [book["id"] for book in client.get(reverse("book-rest-list"), params).json()]
+
+        assert ids(author="C. S. Lewis") == [2]
+        assert ids(language="DE") == [3]
+        assert ids(pages__gte=337, pages__lte=700) == [1, 3]
+        assert ids(search="Harry") == [3]
+        assert ids(search="harry") == []
+        assert ids(search="羊") == [4]
+        assert ids(author="J. K. Rowling", language="EN") == []
+
+        Book.objects.bulk_create(
+            Book(title=title, author="Nobody", language="UN", pages=1) for title in ["\U0010ffff", "A\ud7ff"]
+        )
+        assert ids(search="\U0010ffff") == [5]
+        assert ids(search="A\ud7ff") == [6]
+
+    @pytest.mark.parametrize(
+        "prefix, upper",
+        [("Moby", "Mobz"), ("Jazz", "Jaz{"), ("a\U0010ffff", "b"), ("\ud7ff", "\ue000"), ("\U0010ffff", None)],
+    )
+    def test_prefix_range(self, prefix, upper):
+        """Ensure prefix ranges end at the next storable character, if any."""
+        assert prefix_range(prefix) == (prefix, upper)
+        assert BookFilterBackend().prefix_lookups(prefix, "postgresql") == {"title__startswith": prefix}
+
+    def test_ordering_rest(self, books):
+        """Ensure lists can be ordered and paginated by an allowed field: GET /books/?ordering=-title"""
+        client = APIClient()
+
+        url = reverse("book-rest-list")
+        response = client.get(url, {"ordering": "-title"})
+
+        assert [book["id"] for book in response.json()] == [4, 1, 3, 2]
+
+        page = client.get(url, {"ordering": "title", "page_size": 2, "fields": "author"}).json()
+        assert page["results"] == [{"author": "C. S. Lewis"}, {"author": "J. K. Rowling"}]
+
+        page = client.get(page["next"]).json()
+        assert page["results"] == [{"author": "Herman Melville"}, {"author": "Haruki Murakami"}]
+
+    def test_invalid_filter_failure(self, books):
+        """Ensure invalid filters and unindexed orderings are rejected: GET /books/?ordering=pages"""
+        client = APIClient()
+
+        url = reverse("book-rest-list")
+        response = client.get(url, {"pages__gte": "many", "ordering": "title"})
+
+        assert response.status_code is HTTP_400_BAD_REQUEST
+        assert response.json() == {"pages__gte": ["A valid integer is required."]}
+
+        response = client.get(url, {"language": "english"})
+
+        assert response.status_code is HTTP_400_BAD_REQUEST
+        assert response.json() == {"language": ['"english" is not a valid choice.']}
+
+        response = client.get(url, {"ordering": "title,-pages"})
+
+        assert response.status_code is HTTP_400_BAD_REQUEST
+        assert response.json() == {"ordering": ["Invalid ordering field: -pages"]}
+
+    @pytest.mark.benchmark(group="filter-catalogue")
+    @pytest.mark.parametrize(
+        "params",
+        [
+            {"author": "J.K. Rowling"},
+            {"language": "SP", "pages__gte": 300},
+            {"search": "Harry Potter"},
+            {"ordering": "title", "page_size": 100},
+        ],
+        ids=lambda params: "&".join(params),
+    )
+    def test_filter_rest_catalogue(self, benchmark, catalogue, params):
+        """Benchmark filtered reads on the full books.yaml dataset."""
+        client = APIClient()
+
+        url = reverse("book-rest-list")
+        response = benchmark.pedantic(
+            client.get, args=(url, params), setup=book_cache.clear, rounds=20
+        )
+
+        assert response.status_code is HTTP_200_OK
+        assert response.json()
+
+    def test_search_rest(self, books):
+        """Ensure books are searched by title and author words, best match first: GET /books/search/?q=..."""
+        client = APIClient()
+
+        Book.objects.create(title="Herman", author="Nobody", language="EN", pages=1)
+        url = reverse("book-rest-search")
+
+        def ids(**params):
+            return [book["id"] for book in client.get(url, params).json()["results"]]
+
+        assert ids(q="harry weisen") == [3]
+        assert ids(q="narnia lewis") == [2]
+        assert ids(q="herman") == [5, 1]
+        assert ids(q="dune") == []
+
+        page = client.get(url, {"q": "herman", "page_size": 1, "fields": "title"}).json()
+        assert page["results"] == [{"title": "Herman"}]
+        assert page["previous"] is None
+
+        page = client.get(page["next"]).json()
+        assert page["results"] == [{"title": "Moby Dick"}]
+        assert page["next"] is None
+        assert client.get(page["previous"]).json()["results"] == [{"title": "Herman"}]
+
+    def test_search_index_follows_writes_rest(self, books):
+        """Ensure the search index follows creates, updates and deletes."""
+        client = APIClient()
+
+        url = reverse("book-rest-search")
+
+        client.patch(reverse("book-rest-detail", kwargs={"pk": 1}), {"title": "The Whale"})
+        client.patch(reverse("book-rest-bulk"), [{"id": 2, "title": "Whale Tales"}], format="json")
+        client.delete(reverse("book-rest-detail", kwargs={"pk": 3}))
+
+        assert sorted(book["id"] for book in client.get(url, {"q": "whale"}).json()["results"]) == [1, 2]
+        assert client.get(url, {"q": "moby"}).json()["results"] == []
+        assert client.get(url, {"q": "potter"}).json()["results"] == []
+
+    def test_invalid_search_failure(self, books):
+        """Ensure searches without words or with a bad page are rejected: GET /books/search/"""
+        client = APIClient()
+
+        url = reverse("book-rest-search")
+
+        assert client.get(url).json() == {"q": ["This field is required."]}
+        assert client.get(url, {"q": "moby", "page": 0}).json() == {"page": ["A positive integer is required."]}
+        assert client.get(url, {"q": "---"}).json()["results"] == []
+
+    @pytest.mark.benchmark(group="search-catalogue")
+    @pytest.mark.parametrize("index", ["fts", "icontains"])
+    def test_search_catalogue(self, benchmark, catalogue, index):
+        """Benchmark the text index against an ``icontains`` scan on the full books.yaml dataset."""
+
+        def search():
+            if index == "fts":
+                return search_books("potter", 0, 100)[0]
+
+            query = Q(title__icontains="potter") | Q(author__icontains="potter")
+            return list(Book.objects.filter(query).values()[:100])
+
+        results = benchmark.pedantic(search, setup=book_cache.clear, rounds=20)
+
+        assert results
+        assert all("potter" in f"{book['title']} {book['author']}".lower() for book in results)
+
+    def test_export_rest(self, benchmark, books):
+        """Ensure we can stream all books as JSON: GET /books/export/"""
+        client = APIClient()
+
+        url = reverse("book-rest-export")
+        response = benchmark(client.get, url)
+
+        assert response.status_code is HTTP_200_OK
+        assert response.streaming
+        assert json.loads(b"".join(response.streaming_content)) == (
+            client.get(reverse("book-rest-list")).json()
+        )
+
+    def test_export_ndjson_rest(self, books):
+        """Ensure we can stream all books as NDJSON: GET /books/export/?ndjson=1"""
+        client = APIClient()
+
+        url = reverse("book-rest-export")
+        response = client.get(url, {"ndjson": 1})
+        lines = b"".join(response.streaming_content).decode().splitlines()
+
+        assert response.status_code is HTTP_200_OK
+        assert response["Content-Type"] == "application/x-ndjson"
+        assert [json.loads(line) for line in lines] == (
+            client.get(reverse("book-rest-list")).json()
+        )
+
+    def test_fast_serializer_output(self, many_books):
+        """Ensure the fast serializer renders exactly what BookSerializer does"""
+        renderer = JSONRenderer()
+        fast_serializer = BookFastSerializer()
+
+        queryset = Book.objects.order_by("id")
+
+        assert renderer.render(
+            fast_serializer.serialize(fast_serializer.values(queryset))
+        ) == renderer.render(BookSerializer(queryset, many=True).data)
+
+    @pytest.mark.benchmark(group="serialize-10k")
+    def test_serialize_book_serializer(self, benchmark, many_books):
+        """Benchmark rendering 10k books with BookSerializer"""
+        renderer = JSONRenderer()
+
+        def serialize():
+            return renderer.render(BookSerializer(Book.objects.all(), many=True).data)
+
+        benchmark(serialize)
+
+    @pytest.mark.benchmark(group="serialize-10k")
+    def test_serialize_fast_serializer(self, benchmark, many_books):
+        """Benchmark rendering 10k books with BookFastSerializer"""
+        renderer = JSONRenderer()
+        fast_serializer = BookFastSerializer()
+
+        def serialize():
+            rows = fast_serializer.values(Book.objects.all())
+            return renderer.render(fast_serializer.serialize(rows))
+
+        benchmark(serialize)
+
     def test_update_rest(self, benchmark, books):
         """Ensure we can update a book: PUT /books/1"""
         client = APIClient()
@@ -333,44 +957,267 @@ class TestBooksREST:
             Book.objects.get(pk=1)  # deleted book
             assert excinfo.value == "Book matching query does not exist"
 
+    @pytest.mark.benchmark(group="bulk-create-1k")
+    def test_bulk_create_rest(self, benchmark):
+        """Ensure we can create many books at once: POST /books/bulk/"""
+        client = APIClient()
 
-@pytest.mark.django_db
-class TestBooksGraphQL:
-    def test_visualize_schema(self):
-        """Ensure the allowed methods are OPTIONS, GET, HEAD, POST, PUT, PATCH, DELETE"""
-        client = GrapheneClient(schema)
+        body = [
+            {"title": f"Book {n}", "author": "Author", "language": "EN", "pages": n}
+            for n in range(1, 1001)
+        ]
 
-        query = """
-        query {
-            __schema {
-                queryType {
-                name
-                fields {
-                    name
-                    type {
-                    name
-                    }
-                    args {
-                    name
-                    }
-                }
-                
-                }
-                mutationType {
-                name
-                    fields {
-                    name
-                    type {
-                    name
-                    }
-                    args {
-                    name
-                    }
-                }
-                }
-            }
-        }
-        """
+        url = reverse("book-rest-bulk")
+        response = benchmark(client.post, url, body, format="json")
+
+        assert response.status_code is HTTP_201_CREATED
+        assert response.json()["errors"] == []
+        assert response.json()["results"][-1]["title"] == "Book 1000"
+        assert Book.objects.filter(title="Book 1000").exists()
+
+    @pytest.mark.benchmark(group="bulk-create-1k")
+    def test_create_many_rest(self, benchmark):
+        """Benchmark creating the same books one request at a time: POST /books/"""
+        client = APIClient()
+
+        body = [
+            {"title": f"Book {n}", "author": "Author", "language": "EN", "pages": n}
+            for n in range(1, 1001)
+        ]
+
+        url = reverse("book-rest-list")
+
+        def create_many():
+            for book in body:
+                client.post(url, book, format="json")
+
+        benchmark.pedantic(create_many, rounds=3)
+
+        assert Book.objects.filter(title="Book 1000").exists()
+
+    def test_bulk_partial_errors_rest(self, books):
+        """Ensure invalid items are reported while the valid ones are written"""
+        client = APIClient()
+
+        url = reverse("book-rest-bulk")
+        body = [
+            {"title": "Dom Casmurro", "author": "Machado de Assis", "pages": 256},
+            {"title": "Dom Casmurro", "author": "Machado de Assis", "language": "XY"},
+        ]
+        response = client.post(url, body, format="json")
+
+        assert response.status_code is HTTP_201_CREATED
+        assert response.json() == {
+            "results": [
+                {
+                    "id": 5,
+                    "title": "Dom Casmurro",
+                    "author": "Machado de Assis",
+                    "pages": 256,
+                    "language": "UN",
+                }
+            ],
+            "errors": [
+                {
+                    "index": 1,
+                    "errors": {
+                        "pages": ["This field is required."],
+                        "language": ['"XY" is not a valid choice.'],
+                    },
+                }
+            ],
+        }
+
+    def test_bulk_update_and_delete_rest(self, books):
+        """Ensure we can update and delete many books at once: PATCH/DELETE /books/bulk/"""
+        client = APIClient()
+
+        url = reverse("book-rest-bulk")
+        body = [{"id": 1, "pages": 700}, {"id": 2, "language": "PT"}, {"id": 99}]
+        response = client.patch(url, body, format="json")
+
+        assert response.status_code is HTTP_200_OK
+        assert [book["id"] for book in response.json()["results"]] == [1, 2]
+        assert response.json()["errors"] == [
+            {"index": 2, "errors": {"id": ["Book matching query does not exist."]}}
+        ]
+        assert list(Book.objects.order_by("id").values_list("pages", "language")[:2]) == [
+            (700, "EN"),
+            (752, "PT"),
+        ]
+
+        response = client.delete(url, [1, 2, 99], format="json")
+
+        assert response.status_code is HTTP_200_OK
+        assert response.json()["results"] == [1, 2]
+        assert list(Book.objects.order_by("id").values_list("id", flat=True)) == [3, 4]
+
+    def test_bulk_expects_list_failure(self):
+        """Ensure the bulk endpoint only accepts lists"""
+        client = APIClient()
+
+        url = reverse("book-rest-bulk")
+        response = client.post(url, {"title": "Moby Dick"}, format="json")
+
+        assert response.status_code is HTTP_400_BAD_REQUEST
+
+    def test_import_csv_rest(self, books):
+        """Ensure a CSV upload upserts books by title and author: POST /books/api/import/"""
+        client = APIClient()
+
+        content = (
+            "title,author,pages,language\n"
+            "Moby Dick,Herman Melville,700,EN\n"
+            "Dom Casmurro,Machado de Assis,256,portuguese\n"
+            "Dom Casmurro,Machado de Assis,257,PT\n"
+            ",Nobody,12,XY\n"
+        )
+        upload = SimpleUploadedFile("books.csv", content.encode("utf-8"))
+
+        url = reverse("book-rest-import")
+        response = client.post(url, {"file": upload}, format="multipart")
+
+        assert response.status_code is HTTP_200_OK
+        assert response.json() == {
+            "rows": 4,
+            "created": 1,
+            "updated": 1,
+            "unchanged": 0,
+            "rejected": 1,
+            "rejects": [
+                {
+                    "line": 5,
+                    "errors": {"title": ["This field is required."], "language": ['"XY" is not a valid choice.']},
+                }
+            ],
+        }
+        assert list(Book.objects.order_by("id").values_list("title", "pages", "language"))[::4] == [
+            ("Moby Dick", 700, "EN"),
+            ("Dom Casmurro", 257, "PT"),
+        ]
+
+    def test_import_ndjson_rest(self, books):
+        """Ensure an NDJSON upload is imported and rows that change nothing are not written"""
+        client = APIClient()
+
+        rows = [
+            {"title": "Moby Dick", "author": "Herman Melville", "pages": 700, "language": "english"},
+            {"title": "Dom Casmurro", "author": "Machado de Assis", "pages": "two hundred"},
+            {"title": "Dom Casmurro", "author": "Machado de Assis", "pages": 256, "language": ["PT"]},
+            {"title": "Dom Casmurro", "author": "Machado de Assis", "pages": 256, "language": {"code": "PT"}},
+        ]
+        content = ("\n".join(map(json.dumps, rows)) + "\n{broken\n").encode("utf-8")
+
+        url = reverse("book-rest-import")
+        response = client.post(url, {"file": SimpleUploadedFile("books.ndjson", content)}, format="multipart")
+
+        assert response.status_code is HTTP_200_OK
+        assert response.json()["updated"] == 1
+
+        response = client.post(url, {"file": SimpleUploadedFile("books.ndjson", content)}, format="multipart")
+
+        assert response.json()["updated"] == 0
+        assert response.json()["unchanged"] == 1
+        assert response.json()["rejects"] == [
+            {"line": 2, "errors": {"pages": ["A valid integer is required."]}},
+            {"line": 3, "errors": {"language": ["\"['PT']\" is not a valid choice."]}},
+            {"line": 4, "errors": {"language": ["\"{'code': 'PT'}\" is not a valid choice."]}},
+            {"line": 5, "errors": {"non_field_errors": ["Expected an object."]}},
+        ]
+        assert Book.objects.count() == 4
+
+    def test_import_failure_rest(self):
+        """Ensure uploads without a file, of an unknown format or with only bad rows are rejected"""
+        client = APIClient()
+
+        url = reverse("book-rest-import")
+        response = client.post(url, {}, format="multipart")
+        assert response.status_code is HTTP_400_BAD_REQUEST
+
+        upload = SimpleUploadedFile("books.xlsx", b"")
+        response = client.post(url, {"file": upload}, format="multipart")
+        assert response.json() == {"file": ["Expected a .csv, .ndjson or .jsonl file."]}
+
+        upload = SimpleUploadedFile("books.csv", b"title,author\nMoby Dick,Herman Melville\n")
+        response = client.post(url, {"file": upload}, format="multipart")
+        assert response.status_code is HTTP_400_BAD_REQUEST
+        assert response.json()["rejected"] == 1
+
+    def test_import_batches(self, tmp_path):
+        """Ensure the importer writes one batch at a time, keeping only that batch in memory."""
+        path = tmp_path / "books.csv"
+        path.write_text(
+            "title,author,pages\n" + "".join(f"Book {n},Author,{n}\n" for n in range(1, 11))
+        )
+        progress = []
+
+        importer = BookImporter(batch_size=4, on_batch=lambda report: progress.append(report.created))
+        with open(path, "rb") as stream:
+            report = importer.run(stream, "csv")
+
+        assert progress == [4, 8, 10]
+        assert report.as_dict()["created"] == Book.objects.count() == 10
+
+    @pytest.mark.benchmark(group="bulk-create-1k")
+    def test_import_rest(self, benchmark):
+        """Benchmark importing the same books from a CSV upload: POST /books/api/import/"""
+        client = APIClient()
+
+        content = "title,author,language,pages\n" + "".join(
+            f"Book {n},Author,EN,{n}\n" for n in range(1, 1001)
+        )
+        url = reverse("book-rest-import")
+
+        def post():
+            upload = SimpleUploadedFile("books.csv", content.encode("utf-8"))
+            return client.post(url, {"file": upload}, format="multipart")
+
+        def truncate():
+            Book.objects.all().delete()
+
+        response = benchmark.pedantic(post, setup=truncate, rounds=5)
+
+        assert response.status_code is HTTP_200_OK
+        assert response.json()["created"] == Book.objects.count() == 1000
+
+
+@pytest.mark.django_db
+class TestBooksGraphQL:
+    def test_visualize_schema(self):
+        """Ensure the allowed methods are OPTIONS, GET, HEAD, POST, PUT, PATCH, DELETE"""
+        client = GrapheneClient(schema)
+
+        query = """
+        query {
+            __schema {
+                queryType {
+                name
+                fields {
+                    name
+                    type {
+                    name
+                    }
+                    args {
+                    name
+                    }
+                }
+                
+                }
+                mutationType {
+                name
+                    fields {
+                    name
+                    type {
+                    name
+                    }
+                    args {
+                    name
+                    }
+                }
+                }
+            }
+        }
+        """
 
         result = {
             "data": {
@@ -383,7 +1230,16 @@ class TestBooksGraphQL:
                                 "type": {"name": "BookType"},
                                 "args": [{"name": "id"}, {"name": "title"}],
                             },
-                            {"name": "allBooks", "type": {"name": None}, "args": []},
+                            {
+                                "name": "allBooks",
+                                "type": {"name": "BookConnection"},
+                                "args": [{"name": "first"}, {"name": "after"}],
+                            },
+                            {
+                                "name": "searchBooks",
+                                "type": {"name": "BookConnection"},
+                                "args": [{"name": "query"}, {"name": "first"}, {"name": "after"}],
+                            },
                         ],
                     },
                     "mutationType": {
@@ -404,6 +1260,21 @@ class TestBooksGraphQL:
                                 "type": {"name": "DeleteBookMutation"},
                                 "args": [{"name": "id"}],
                             },
+                            {
+                                "name": "createBooks",
+                                "type": {"name": "CreateBooksMutation"},
+                                "args": [{"name": "input"}],
+                            },
+                            {
+                                "name": "updateBooks",
+                                "type": {"name": "UpdateBooksMutation"},
+                                "args": [{"name": "input"}],
+                            },
+                            {
+                                "name": "deleteBooks",
+                                "type": {"name": "DeleteBooksMutation"},
+                                "args": [{"name": "ids"}],
+                            },
                         ],
                     },
                 }
@@ -468,7 +1339,7 @@ class TestBooksGraphQL:
                     "id": "1",
                     "title": "Moby Dick",
                     "author": "Herman Melville",
-                    "language": "english",
+                    "language": "EN",
                     "pages": 677,
                 }
             }
@@ -476,58 +1347,292 @@ class TestBooksGraphQL:
 
         assert benchmark(client.execute, query) == result
 
+    def test_read_many_gql(self, benchmark, books):
+        """Ensure aliased book fields are fetched with a single query"""
+        client = GrapheneClient(schema)
+
+        aliases = "\n".join(
+            f"book{n}: book(id: {n % 4 + 1}) {{ id }}" for n in range(50)
+        )
+        query = f"""
+        query {{
+            {aliases}
+            byTitle: book(title: "Moby Dick") {{ id }}
+        }}"""
+
+        result = benchmark(execute_gql, client, query, num_queries=1)
+
+        assert "errors" not in result
+        assert result["data"]["book49"] == {"id": "2"}
+        assert result["data"]["byTitle"] == {"id": "1"}
+
+    def test_read_missing_gql(self, books):
+        """Ensure a missing book is reported as an error without breaking the batch"""
+        client = GrapheneClient(schema)
+
+        query = """
+        query {
+            found: book(id: 1) { title }
+            missing: book(id: 100) { title }
+        }"""
+
+        result = execute_gql(client, query, num_queries=1)
+
+        assert result["data"] == {"found": {"title": "Moby Dick"}, "missing": None}
+        assert result["errors"][0]["message"] == "Book matching query does not exist."
+
     def test_read_all_gql(self, benchmark, books):
-        """Ensure we can list all books: GET /books/"""
+        """Ensure we can list the first page of books"""
         client = GrapheneClient(schema)
 
         query = """ 
         query {
             allBooks {
-                    id
-                    title
-                    author
-                    language
-                    pages
+                edges {
+                    node {
+                        id
+                        title
+                        author
+                        language
+                        pages
+                    }
+                }
+                pageInfo {
+                    hasNextPage
                 }
-            }"""
+            }
+        }"""
 
         result = {
             "data": {
-                "allBooks": [
-                    {
-                        "id": "1",
-                        "title": "Moby Dick",
-                        "author": "Herman Melville",
-                        "language": "english",
-                        "pages": 677,
-                    },
-                    {
-                        "id": "2",
-                        "title": "As Crônicas de Nárnia",
-                        "author": "C. S. Lewis",
-                        "language": "portuguese",
-                        "pages": 752,
-                    },
-                    {
-                        "id": "3",
-                        "title": "Harry Potter und Der Stein der Weisen",
-                        "author": "J. K. Rowling",
-                        "language": "german",
-                        "pages": 337,
-                    },
-                    {
-                        "id": "4",
-                        "title": "羊をめぐる冒険",
-                        "author": "Haruki Murakami",
-                        "language": "japanese",
-                        "pages": 331,
-                    },
-                ]
+                "allBooks": {
+                    "edges": [
+                        {
+                            "node": {
+                                "id": "1",
+                                "title": "Moby Dick",
+                                "author": "Herman Melville",
+                                "language": "EN",
+                                "pages": 677,
+                            }
+                        },
+                        {
+                            "node": {
+                                "id": "2",
+                                "title": "As Crônicas de Nárnia",
+                                "author": "C. S. Lewis",
+                                "language": "PT",
+                                "pages": 752,
+                            }
+                        },
+                        {
+                            "node": {
+                                "id": "3",
+                                "title": "Harry Potter und Der Stein der Weisen",
+                                "author": "J. K. Rowling",
+                                "language": "DE",
+                                "pages": 337,
+                            }
+                        },
+                        {
+                            "node": {
+                                "id": "4",
+                                "title": "羊をめぐる冒険",
+                                "author": "Haruki Murakami",
+                                "language": "JP",
+                                "pages": 331,
+                            }
+                        },
+                    ],
+                    "pageInfo": {"hasNextPage": False},
+                }
             }
         }
 
         assert benchmark(client.execute, query) == result
 
+    def test_paginate_gql(self, books):
+        """Ensure we can walk the book list with cursors"""
+        client = GrapheneClient(schema)
+
+        query = """
+        query page($after: String) {
+            allBooks(first: 2, after: $after) {
+                edges { node { id } }
+                pageInfo { hasNextPage hasPreviousPage endCursor }
+            }
+        }"""
+
+        first_page = client.execute(query)["data"]["allBooks"]
+
+        assert [edge["node"]["id"] for edge in first_page["edges"]] == ["1", "2"]
+        assert first_page["pageInfo"]["hasNextPage"]
+        assert not first_page["pageInfo"]["hasPreviousPage"]
+
+        variables = {"after": first_page["pageInfo"]["endCursor"]}
+        second_page = client.execute(query, variable_values=variables)["data"]["allBooks"]
+
+        assert [edge["node"]["id"] for edge in second_page["edges"]] == ["3", "4"]
+        assert not second_page["pageInfo"]["hasNextPage"]
+        assert second_page["pageInfo"]["hasPreviousPage"]
+
+    def test_projected_read_all_gql(self, books):
+        """Ensure only the selected columns are read"""
+        client = GrapheneClient(schema)
+
+        query = """
+        query {
+            allBooks(first: 1) {
+                edges { node { ...bookTitle } }
+            }
+        }
+        fragment bookTitle on BookType { title }
+        """
+
+        with CaptureQueriesContext(connection) as queries:
+            result = client.execute(query)
+
+        assert result["data"]["allBooks"]["edges"] == [{"node": {"title": "Moby Dick"}}]
+        assert len(queries) == 1
+        assert '"author"' not in queries[0]["sql"]
+
+    def test_invalid_cursor_gql(self, books):
+        """Ensure a tampered cursor is rejected"""
+        client = GrapheneClient(schema)
+
+        query = """
+        query {
+            allBooks(after: "bm90LWEtY3Vyc29y") { edges { cursor } }
+        }"""
+
+        result = client.execute(query)
+
+        assert result["errors"][0]["message"] == "Invalid cursor"
+
+    def test_search_gql(self, books):
+        """Ensure searchBooks pages through ranked results"""
+        client = GrapheneClient(schema)
+
+        Book.objects.create(title="Herman", author="Nobody", language="EN", pages=1)
+
+        query = """
+        query search($after: String) {
+            searchBooks(query: "herman", first: 1, after: $after) {
+                edges { node { id title } }
+                pageInfo { hasNextPage endCursor }
+            }
+        }"""
+
+        page = client.execute(query)["data"]["searchBooks"]
+        assert page["edges"] == [{"node": {"id": "5", "title": "Herman"}}]
+        assert page["pageInfo"]["hasNextPage"]
+
+        after = page["pageInfo"]["endCursor"]
+        page = client.execute(query, variable_values={"after": after})["data"]["searchBooks"]
+        assert page["edges"] == [{"node": {"id": "1", "title": "Moby Dick"}}]
+        assert not page["pageInfo"]["hasNextPage"]
+
+        result = client.execute(query, variable_values={"after": "bm90LWEtY3Vyc29y"})
+        assert result["errors"][0]["message"] == "Invalid cursor"
+
+    def test_read_all_gql_large_table(self, benchmark, many_books):
+        """Ensure a deep page of a large table costs the same as the first one"""
+        client = GrapheneClient(schema)
+
+        query = """
+        query page($after: String) {
+            allBooks(first: 100, after: $after) {
+                edges { node { id title author language pages } }
+                pageInfo { hasNextPage }
+            }
+        }"""
+
+        variables = {"after": to_cursor(len(many_books) - 100)}
+        result = benchmark(client.execute, query, variable_values=variables)
+
+        edges = result["data"]["allBooks"]["edges"]
+
+        assert len(edges) == 100
+        assert edges[-1]["node"]["id"] == str(len(many_books))
+        assert not result["data"]["allBooks"]["pageInfo"]["hasNextPage"]
+
+    def test_persisted_query_gql(self, books):
+        """Ensure persisted queries can be registered and then sent by hash only"""
+        client = Client()
+
+        query = "query { book(id: 1) { title } }"
+        extensions = {"persistedQuery": {"version": 1, "sha256Hash": query_hash(query)}}
+
+        def post(**body):
+            response = client.post("/graphql/", body, content_type="application/json")
+            return response.json()
+
+        assert post(extensions=extensions) == {
+            "errors": [
+                {
+                    "message": "PersistedQueryNotFound",
+                    "extensions": {"code": "PERSISTED_QUERY_NOT_FOUND"},
+                }
+            ]
+        }
+
+        result = {"data": {"book": {"title": "Moby Dick"}}}
+
+        assert post(query=query, extensions=extensions) == result
+        assert post(extensions=extensions) == result
+
+    @pytest.mark.parametrize(
+        "extensions",
+        [[1], "[1]", {"persistedQuery": "x"}, {"persistedQuery": {"version": 1}}, {"persistedQuery": {"sha256Hash": 1}}],
+    )
+    def test_persisted_query_invalid_gql(self, extensions):
+        """Ensure malformed extensions answer 400"""
+        body = {"query": "query { book(id: 1) { title } }", "extensions": extensions}
+        response = Client().post("/graphql/", body, content_type="application/json")
+
+        assert response.status_code == HTTP_400_BAD_REQUEST
+
+    def test_document_cache_gql(self, books):
+        """Ensure documents are parsed and validated once"""
+        backend = CachedDocumentBackend(maxsize=1)
+
+        first = backend.document_from_string(schema, "query { book(id: 1) { id } }")
+        again = backend.document_from_string(schema, "query { book(id: 1) { id } }")
+        backend.document_from_string(schema, "query { book(id: 2) { id } }")
+
+        assert first is again
+        assert first.execute().data == {"book": {"id": "1"}}
+        assert backend.cache_info() == {"hits": 1, "misses": 2, "maxsize": 1, "currsize": 1}
+
+        invalid = backend.document_from_string(schema, "query { book(id: 1) { isbn } }")
+
+        assert invalid.execute().invalid
+        assert backend.cache_info()["currsize"] == 1
+
+    @pytest.mark.benchmark(group="graphql-documents")
+    @pytest.mark.parametrize(
+        "backend",
+        [GraphQLCoreBackend(), CachedDocumentBackend(maxsize=1)],
+        ids=["uncached", "cached"],
+    )
+    def test_document_backend_gql(self, benchmark, books, backend):
+        """Benchmark parsing, validating and executing one book query"""
+        query = """
+        query {
+            book(id: 1) {
+                id
+                title
+                author
+                language
+                pages
+            }
+        }"""
+
+        def execute():
+            return backend.document_from_string(schema, query).execute()
+
+        assert benchmark(execute).data["book"]["title"] == "Moby Dick"
+
     def test_update_gql(self, benchmark, books):
         """Ensure we can partial update a book"""
         client = GrapheneClient(schema)
@@ -589,3 +1694,563 @@ class TestBooksGraphQL:
         with pytest.raises(Book.DoesNotExist) as excinfo:
             Book.objects.get(pk=1)  # deleted book
             assert excinfo.value == "Book matching query does not exist"
+
+    def test_bulk_mutations_gql(self, books):
+        """Ensure we can create, update and delete many books in one mutation each"""
+        client = GrapheneClient(schema)
+
+        mutation = """
+        mutation bulk($create: [BulkCreateBookInput!]!, $update: [BulkPatchBookInput!]!) {
+            createBooks(input: $create) {
+                books { id title }
+                errors { index field messages }
+            }
+            updateBooks(input: $update) {
+                books { id pages }
+                errors { index field messages }
+            }
+            deleteBooks(ids: [3, 4, 99]) {
+                deletedIds
+                errors { index field messages }
+            }
+        }
+        """
+
+        variables = {
+            "create": [
+                {"title": "Dom Casmurro", "author": "Machado de Assis", "pages": 256},
+                {
+                    "title": "Dom Casmurro",
+                    "author": "Machado de Assis",
+                    "pages": 256,
+                    "language": "XY",
+                },
+            ],
+            "update": [{"id": 1, "pages": 700}, {"id": 2, "pages": 800}],
+        }
+
+        result = client.execute(mutation, variable_values=variables)
+
+        assert "errors" not in result
+        assert result["data"] == {
+            "createBooks": {
+                "books": [{"id": "5", "title": "Dom Casmurro"}],
+                "errors": [
+                    {
+                        "index": 1,
+                        "field": "language",
+                        "messages": ['"XY" is not a valid choice.'],
+                    }
+                ],
+            },
+            "updateBooks": {
+                "books": [{"id": "1", "pages": 700}, {"id": "2", "pages": 800}],
+                "errors": [],
+            },
+            "deleteBooks": {
+                "deletedIds": ["3", "4"],
+                "errors": [
+                    {
+                        "index": 2,
+                        "field": "id",
+                        "messages": ["Book matching query does not exist."],
+                    }
+                ],
+            },
+        }
+        assert list(Book.objects.order_by("id").values_list("id", "pages")) == [(1, 700), (2, 800), (5, 256)]
+
+
+@pytest.mark.django_db
+class TestBookCommands:
+    def write_fixture(self, path, objects):
+        path.write_text(yaml.safe_dump(objects))
+        return path
+
+    def test_load_books(self, tmp_path):
+        """Ensure load_books inserts the fixture with language codes and skips existing ids."""
+        rows = [
+            (7, "Moby Dick", "Herman Melville", 635, "english"),
+            (9, "Dom Casmurro", "Machado de Assis", 256, "PT"),
+            (8, "Codex", "Anonymous", 10, "klingon"),
+        ]
+        fixture = self.write_fixture(
+            tmp_path / "books.yaml",
+            [
+                {
+                    "model": "my_books.book",
+                    "pk": pk,
+                    "fields": {"title": title, "author": author, "pages": pages, "language": language},
+                }
+                for pk, title, author, pages, language in rows
+            ],
+        )
+
+        call_command("load_books", fixture, no_cache=True, stdout=StringIO(), stderr=StringIO())
+        call_command("load_books", fixture, no_cache=True, stdout=StringIO(), stderr=StringIO())
+
+        assert list(Book.objects.order_by("id").values_list("id", "language")) == [(7, "EN"), (8, "UN"), (9, "PT")]
+        assert Book.objects.filter(updated_at__isnull=True).count() == 0
+        assert Book.objects.create(title="New", author="Someone", pages=1).pk > 9
+
+    def test_import_books(self, books, tmp_path):
+        """Ensure import_books upserts a file and writes every reject to --rejects."""
+        path = tmp_path / "books.jsonl"
+        path.write_text(
+            '{"title": "Moby Dick", "author": "Herman Melville", "pages": 700}\n'
+            '{"title": "Moby Dick", "author": "Herman Melville", "pages": -1, "language": "klingon"}\n'
+            '{"title": "Moby Dick", "author": "Herman Melville", "pages": -1, "language": ["EN"]}\n'
+        )
+        rejects = tmp_path / "rejects.ndjson"
+        stdout = StringIO()
+
+        call_command("import_books", path, rejects=rejects, stdout=stdout, stderr=StringIO())
+
+        assert "1 updated, 0 unchanged, 2 rejected" in stdout.getvalue()
+        assert Book.objects.get(title="Moby Dick").pages == 700
+        assert list(map(json.loads, rejects.read_text().splitlines())) == [
+            {"line": 2, "errors": {"language": ['"klingon" is not a valid choice.']}},
+            {"line": 3, "errors": {"language": ["\"['EN']\" is not a valid choice."]}},
+        ]
+
+    def test_load_books_missing_fixture_failure(self, tmp_path):
+        with pytest.raises(CommandError):
+            call_command("load_books", tmp_path / "missing.yaml")
+
+    @pytest.mark.benchmark(group="load-fixture")
+    @pytest.mark.parametrize("command", ["load_books", "loaddata"])
+    def test_load_fixture(self, benchmark, tmp_path, command):
+        """Benchmark load_books against loaddata on the first 1000 books of books.yaml."""
+        fixture = self.write_fixture(tmp_path / "books.yaml", read_catalogue()[:1000])
+
+        def truncate():
+            Book.objects.all().delete()
+
+        benchmark.pedantic(
+            call_command,
+            args=(command, fixture),
+            kwargs={"verbosity": 0, "stdout": StringIO()},
+            setup=truncate,
+            rounds=3,
+        )
+
+        assert Book.objects.count() == 1000
+
+
+@pytest.mark.django_db
+class TestBookIndexes:
+    @pytest.mark.parametrize(
+        "lookup",
+        [
+            {"pk": 1},
+            {"title": "Moby Dick"},
+            {"author": "Herman Melville"},
+            {"language": "EN"},
+            {"language": "EN", "pages__gte": 100, "pages__lte": 700},
+            {"title__gte": "Moby", "title__lt": "Mobz", "title__startswith": "Moby"},
+        ],
+        ids=lambda lookup: ",".join(lookup),
+    )
+    def test_lookup_uses_index(self, books, lookup):
+        """Ensure the main book lookups are served by an index."""
+        assert_no_sequential_scan(Book.objects.filter(**lookup))
+
+    def test_language_aggregation_uses_index(self, books):
+        """Ensure per-language aggregations read the language index instead of the table."""
+        queryset = Book.objects.values("language").annotate(books=Count("id"), pages=Sum("pages"))
+
+        assert "book_language_pages_idx" in explain(queryset.order_by("language"))
+        assert list(queryset.order_by("language")) == [
+            {"language": "EN", "books": 1, "pages": 677},
+            {"language": "PT", "books": 1, "pages": 752},
+            {"language": "DE", "books": 1, "pages": 337},
+            {"language": "JP", "books": 1, "pages": 331},
+        ]
+
+    def test_language_stored_as_integer(self, books):
+        """Ensure languages are stored as small integers but read and written as codes."""
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT language FROM my_books_book ORDER BY id")
+            assert [language for language, in cursor.fetchall()] == [0, 1, 2, 3]
+
+        book = Book(title="Dom Casmurro", author="Machado de Assis", pages=256, language="portuguese")
+        book.full_clean()
+        assert book.language == "PT"
+
+        with pytest.raises(ValidationError):
+            Book(title="Codex", author="Anonymous", pages=10, language="XY").full_clean()
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+class TestBooksAsync:
+    def test_read_one_async(self, benchmark, books):
+        """Ensure the async view returns what the sync one does: GET /books/async/api/1/"""
+        url = reverse("book-async-detail", kwargs={"pk": 1})
+        response = benchmark(get_async, url)
+
+        assert response.status_code is HTTP_200_OK
+        assert response.json() == APIClient().get(reverse("book-rest-detail", kwargs={"pk": 1})).json()
+
+    def test_read_all_async(self, benchmark, books):
+        """Ensure the async list returns what the sync one does: GET /books/async/api/"""
+        url = reverse("book-async-list")
+        response = benchmark(get_async, f"{url}?fields=id,title")
+
+        assert response.status_code is HTTP_200_OK
+        assert response.json() == APIClient().get(reverse("book-rest-list"), {"fields": "id,title"}).json()
+
+    def test_concurrent_reads_async(self, books):
+        """Ensure concurrent async reads share the bounded database pool."""
+
+        async def read_all():
+            urls = [reverse("book-async-detail", kwargs={"pk": pk % 4 + 1}) for pk in range(20)]
+            return await asyncio.gather(*(AsyncClient().get(url) for url in urls))
+
+        responses = async_to_sync(read_all)()
+
+        assert [response.json()["id"] for response in responses] == [pk % 4 + 1 for pk in range(20)]
+
+    def test_server_timing_async(self, books):
+        """Ensure queries the async views run on their thread pool are counted: Server-Timing"""
+        response = get_async(reverse("book-async-detail", kwargs={"pk": 1}))
+
+        assert 'desc="1 queries"' in response["Server-Timing"]
+
+    def test_profiling_async(self, settings, tmp_path, books):
+        """Ensure sampled async requests are profiled too."""
+        settings.PROFILING = True
+        settings.PROFILING_SAMPLE_RATE = 1.0
+        settings.PROFILING_DIR = str(tmp_path)
+
+        get_async(reverse("book-async-detail", kwargs={"pk": 1}))
+
+        [profile] = tmp_path.iterdir()
+        assert profile.name.startswith("book-async-detail.")
+
+    def test_async_failures(self, books):
+        """Ensure the async views answer 404 and 400 like the sync ones."""
+        response = get_async(reverse("book-async-detail", kwargs={"pk": 100}))
+        assert response.status_code == HTTP_404_NOT_FOUND
+
+        response = get_async(reverse("book-async-list") + "?fields=isbn")
+        assert response.status_code == HTTP_400_BAD_REQUEST
+        assert response.json() == {"fields": ["Unknown field: isbn"]}
+
+
+@pytest.mark.django_db
+class TestMiddlewareStacks:
+    def test_routed_stacks(self, books):
+        """Ensure the APIs run the slim middleware stack and the HTML views the full one."""
+        client = Client(enforce_csrf_checks=True)
+
+        response = client.get(reverse("book-rest-detail", kwargs={"pk": 1}))
+        assert response.status_code is HTTP_200_OK
+        assert not response.has_header("X-Frame-Options")
+
+        response = client.get(reverse("book-read", kwargs={"pk": 1}))
+        assert response.status_code is HTTP_200_OK
+        assert response["X-Frame-Options"] == "DENY"
+
+        body = {"title": "Dom Casmurro", "author": "Machado de Assis", "pages": 256, "language": "PT"}
+        response = client.post(reverse("book-create"), body)
+        assert response.status_code == HTTP_403_FORBIDDEN
+
+        query = "mutation create($input: CreateBookInput!) { createBook(input: $input) { book { id } } }"
+        body = {"query": query, "variables": {"input": body}}
+        response = client.post("/graphql/", body, content_type="application/json")
+        assert response.status_code is HTTP_200_OK
+        assert response.json() == {"data": {"createBook": {"book": {"id": "5"}}}}
+
+    def test_timing_report(self, settings, books):
+        """Ensure every layer of the stacks that served requests is timed, view included."""
+        settings.MIDDLEWARE_TIMING = True
+        timings.clear()
+        client = Client()
+
+        client.get(reverse("book-rest-list"))
+        client.get(reverse("book-rest-list"))
+        client.get(reverse("book-list"))
+
+        report = timing_report()
+        timings.clear()
+
+        assert [row["layer"] for row in report["api"]] == [*settings.MIDDLEWARE_STACKS["api"], "view"]
+        assert [row["layer"] for row in report["full"]] == [*settings.MIDDLEWARE_STACKS["full"], "view"]
+        assert {row["calls"] for row in report["api"]} == {2}
+        assert all(row["mean_ms"] >= 0 for rows in report.values() for row in rows)
+
+    def test_timing_report_access(self, settings):
+        """Ensure the timing report is hidden outside DEBUG, and only read or reset with the token."""
+        factory = RequestFactory()
+        timings.add(("api", "view"), 0.01)
+
+        settings.DEBUG, settings.DIAGNOSTICS_TOKEN = False, ""
+        with pytest.raises(Http404):
+            timing_report_view(factory.delete("/middleware/timings/"))
+
+        settings.DIAGNOSTICS_TOKEN = "secret"
+        for headers in [{}, {"HTTP_AUTHORIZATION": "Bearer wrong"}]:
+            with pytest.raises(PermissionDenied):
+                timing_report_view(factory.delete("/middleware/timings/", **headers))
+
+        assert timings.snapshot()
+
+        request = factory.delete("/middleware/timings/", HTTP_AUTHORIZATION="Bearer secret")
+        assert timing_report_view(request).status_code is HTTP_200_OK
+        assert not timings.snapshot()
+
+        settings.DEBUG, settings.DIAGNOSTICS_TOKEN = True, ""
+        assert timing_report_view(factory.get("/middleware/timings/")).status_code is HTTP_200_OK
+
+    @pytest.mark.benchmark(group="middleware-stack")
+    @pytest.mark.parametrize("stack", ["api", "full"])
+    def test_read_one_stack(self, benchmark, settings, books, stack):
+        """Benchmark GET /books/api/1/ through each middleware stack."""
+        settings.MIDDLEWARE_ROUTES = [("", stack)]
+        client = APIClient()
+
+        url = reverse("book-rest-detail", kwargs={"pk": 1})
+        response = benchmark(client.get, url)
+
+        assert response.status_code is HTTP_200_OK
+
+
+@pytest.mark.django_db
+class TestInstrumentation:
+    @pytest.fixture(autouse=True)
+    def clear_registry(self):
+        registry.clear()
+        yield
+        registry.clear()
+
+    def test_server_timing(self, books):
+        """Ensure responses carry their SQL, view and render timings: Server-Timing"""
+        client = APIClient()
+
+        url = reverse("book-rest-detail", kwargs={"pk": 1})
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+
+        timing = dict(entry.split(";", 1) for entry in response["Server-Timing"].split(", "))
+        assert timing.keys() == {"db", "view", "render", "total"}
+        assert timing["db"].endswith(f'desc="{len(queries)} queries"')
+
+        response = Client().get(reverse("book-list"))
+        assert float(response["Server-Timing"].split("render;dur=")[1].split(",")[0]) > 0
+
+    def test_metrics(self, settings, books):
+        """Ensure /metrics/ exposes latency histograms and totals per URL name."""
+        settings.DIAGNOSTICS_TOKEN = "secret"
+        client = APIClient(HTTP_AUTHORIZATION="Bearer secret")
+
+        for _ in range(2):
+            client.get(reverse("book-rest-detail", kwargs={"pk": 1}))
+        client.get(reverse("book-list"))
+
+        response = client.get(reverse("metrics"))
+        assert response.status_code is HTTP_200_OK
+        assert response["Content-Type"].startswith("text/plain; version=0.0.4")
+
+        lines = response.content.decode().splitlines()
+        pid = f'pid="{os.getpid()}"'
+        assert f'books_request_duration_seconds_bucket{{{pid},url_name="book-rest-detail",le="+Inf"}} 2' in lines
+        assert f'books_request_duration_seconds_count{{{pid},url_name="book-rest-detail"}} 2' in lines
+        assert f'books_request_duration_seconds_count{{{pid},url_name="book-list"}} 1' in lines
+        assert any(line.startswith(f'books_db_queries_total{{{pid},url_name="book-list"}}') for line in lines)
+        assert "# TYPE books_cache_lookups_total counter" in lines
+        # every process is its own series, as a scrape reaches any worker
+        assert all(f"{{{pid}," in line for line in lines if not line.startswith("#"))
+
+    def test_metrics_access(self, settings):
+        """Ensure /metrics/ is hidden outside DEBUG, and only served with the token when one is set."""
+        url = reverse("metrics")
+
+        settings.DEBUG, settings.DIAGNOSTICS_TOKEN = False, ""
+        assert Client().get(url).status_code == HTTP_404_NOT_FOUND
+
+        settings.DEBUG = True
+        assert Client().get(url).status_code is HTTP_200_OK
+
+        settings.DIAGNOSTICS_TOKEN = "secret"
+        assert Client().get(url).status_code == HTTP_403_FORBIDDEN
+        assert Client(HTTP_AUTHORIZATION="Bearer wrong").get(url).status_code == HTTP_403_FORBIDDEN
+        assert Client(HTTP_AUTHORIZATION="Bearer secret").get(url).status_code is HTTP_200_OK
+
+    @pytest.mark.benchmark(group="instrumentation")
+    @pytest.mark.parametrize("instrumented", [True, False], ids=["on", "off"])
+    def test_instrumentation_overhead(self, benchmark, settings, books, instrumented):
+        """Benchmark GET /books/api/1/ with and without the instrumentation."""
+        settings.INSTRUMENTATION = instrumented
+        client = APIClient()
+
+        url = reverse("book-rest-detail", kwargs={"pk": 1})
+        response = benchmark(client.get, url)
+
+        assert response.has_header("Server-Timing") is instrumented
+
+
+@pytest.mark.django_db
+class TestProfiling:
+    @pytest.fixture(autouse=True)
+    def profiling(self, settings, tmp_path):
+        settings.PROFILING = True
+        settings.PROFILING_SAMPLE_RATE = 0.0
+        settings.PROFILING_DIR = str(tmp_path)
+
+    def test_signed_header(self, settings, tmp_path, books):
+        """Ensure only requests with a valid signed header are profiled, tagged with their URL name."""
+        client = APIClient()
+        url = reverse("book-rest-detail", kwargs={"pk": 1})
+
+        response = client.get(url)
+        assert not response.has_header("X-Profile")
+
+        response = client.get(url, HTTP_X_PROFILE=profile_token() + "x")
+        assert not response.has_header("X-Profile")
+        assert not any(tmp_path.iterdir())
+
+        response = client.get(url, HTTP_X_PROFILE=profile_token())
+        assert response.status_code is HTTP_200_OK
+
+        [profile] = tmp_path.iterdir()
+        assert response["X-Profile"] == profile.name
+        assert profile.name.startswith("book-rest-detail.") and profile.suffix == ".prof"
+
+        functions = {function for _, _, function in pstats.Stats(str(profile)).stats}
+        assert "retrieve" in functions
+
+        out = StringIO()
+        call_command("profile_token", stdout=out)
+        header, token = out.getvalue().strip().split(": ")
+        assert header == settings.PROFILING_HEADER and token.startswith("profile:")
+
+    def test_sampled_threads(self, settings, tmp_path):
+        """Ensure sampled requests served by concurrent threads are all written, whole and apart."""
+        settings.PROFILING_SAMPLE_RATE = 1.0
+        settings.DIAGNOSTICS_TOKEN = "secret"
+        url = reverse("metrics")
+
+        def read(_):
+            return Client(HTTP_AUTHORIZATION="Bearer secret").get(url).status_code
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            assert set(executor.map(read, range(32))) == {HTTP_200_OK}
+
+        profiles = sorted(tmp_path.iterdir())
+        assert len(profiles) == 32
+        assert {profile.name.split(".")[0] for profile in profiles} == {"metrics"}
+        assert pstats.Stats(*map(str, profiles)).total_calls > 0
+
+    def test_max_files(self, settings, tmp_path, books):
+        """Ensure only the newest PROFILING_MAX_FILES profiles are kept."""
+        settings.PROFILING_MAX_FILES = 3
+        client = APIClient(HTTP_X_PROFILE=profile_token())
+        url = reverse("book-rest-detail", kwargs={"pk": 1})
+
+        names = [client.get(url)["X-Profile"] for _ in range(5)]
+
+        assert sorted(profile.name for profile in tmp_path.iterdir()) == sorted(names[-3:])
+
+    @pytest.mark.benchmark(group="profiling")
+    @pytest.mark.parametrize("rate", [0.0, 1.0], ids=["skipped", "sampled"])
+    def test_profiling_overhead(self, benchmark, settings, books, rate):
+        """Benchmark GET /books/api/1/ with the profiler skipping and sampling every request."""
+        settings.PROFILING_SAMPLE_RATE = rate
+        client = APIClient()
+
+        url = reverse("book-rest-detail", kwargs={"pk": 1})
+        response = benchmark(client.get, url)
+
+        assert response.status_code is HTTP_200_OK
+
+
+class FakePostgresConnection:
+    """Enough of a psycopg2 connection for the pool; its queries fail once the server ``dropped`` it."""
+
+    autocommit = True
+    isolation_level = None
+    info = SimpleNamespace(transaction_status=psycopg2.extensions.TRANSACTION_STATUS_IDLE)
+
+    def __init__(self):
+        self.closed = 0
+        self.dropped = False
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def execute(self, sql):
+        if self.dropped:
+            raise psycopg2.OperationalError("server closed the connection unexpectedly")
+
+    def close(self):
+        self.closed = 1
+
+
+class TestPostgresPool:
+    @pytest.fixture
+    def opened(self, monkeypatch):
+        """Every connection the pool opens, without a server."""
+        opened = []
+
+        def connect(*args, **kwargs):
+            opened.append(FakePostgresConnection())
+            return opened[-1]
+
+        monkeypatch.setattr(psycopg2, "connect", connect)
+        monkeypatch.setattr(psycopg2.extras, "register_default_jsonb", lambda **kwargs: None)
+        monkeypatch.setattr(PostgresWrapper, "pools", {})
+        return opened
+
+    def wrapper(self, health_checks=True):
+        settings_dict = {
+            "NAME": "books",
+            "USER": "",
+            "PASSWORD": "",
+            "HOST": "",
+            "PORT": "",
+            "OPTIONS": {},
+            "CONN_HEALTH_CHECKS": health_checks,
+            "POOL": {"MIN_SIZE": 2, "MAX_SIZE": 2, "TIMEOUT": 1},
+        }
+        return PostgresWrapper(settings_dict, alias="pooled")
+
+    def checkout(self, wrapper):
+        wrapper.connection = wrapper.get_new_connection(wrapper.get_connection_params())
+        return wrapper.connection
+
+    def test_dead_connection_replaced(self, opened):
+        """Ensure pooled connections the server dropped are discarded on checkout, not handed to a query."""
+        wrapper = self.wrapper()
+
+        first = self.checkout(wrapper)
+        wrapper._close()
+        second = self.checkout(wrapper)
+        assert second is first
+
+        # the server drops every idle connection, their sockets still look open
+        wrapper._close()
+        for connection in opened:
+            connection.dropped = True
+
+        third = self.checkout(wrapper)
+        assert third not in opened[:2] and not third.dropped
+        assert all(connection.closed for connection in opened[:2])
+
+    def test_dead_connection_unchecked(self, opened):
+        """Ensure connections are only pinged with CONN_HEALTH_CHECKS, closed ones are always replaced."""
+        wrapper = self.wrapper(health_checks=False)
+
+        first = self.checkout(wrapper)
+        wrapper._close()
+        first.dropped = True
+        assert self.checkout(wrapper) is first
+
+        wrapper._close()
+        first.close()
+        assert self.checkout(wrapper) is not first
@@ -2,6 +2,7 @@ from django.urls import path
 
 from rest_framework import routers
 
+from . import async_views
 from .views import BookList, BookCreate, BookRead, BookUpdate, BookDelete
 from .viewsets import BookViewSet
 
@@ -14,5 +15,7 @@ urlpatterns = [
     path("books/<int:pk>/", BookRead.as_view(), name="book-read"),
     path("books/<int:pk>/update/", BookUpdate.as_view(), name="book-update"),
     path("books/<int:pk>/delete/", BookDelete.as_view(), name="book-delete"),
+    path("books/async/api/", async_views.book_list, name="book-async-list"),
+    path("books/async/api/<int:pk>/", async_views.book_read, name="book-async-detail"),
 ] + router.urls
 
@@ -5,30 +5,90 @@ from django.views.generic import (
     UpdateView,
     DeleteView,
 )
+from django.conf import settings
+from django.http import Http404
+from django.template.loader import get_template
 from django.urls import reverse_lazy
+from django.utils.decorators import method_decorator
+from django.utils.safestring import mark_safe
+from django.views.decorators.http import condition
 
+from .cache import book_cache, from_row
+from .conditional import book_etag, book_last_modified, book_list_etag
 from .models import Book
 
 
+def render_rows(pks, template_name):
+    """Return the HTML fragments of the books in ``pks``, rendering only the uncached ones."""
+    fragments = book_cache.get_fragments(pks)
+
+    if missing := [pk for pk in pks if pk not in fragments]:
+        template = get_template(template_name, using="books")
+        rows = book_cache.rows(missing)
+        rendered = {pk: template.render({"book": rows[pk]}) for pk in missing if pk in rows}
+
+        book_cache.set_fragments(rendered)
+        fragments.update(rendered)
+
+    return [mark_safe(fragments[pk]) for pk in pks if pk in fragments]
+
+
+@method_decorator(condition(etag_func=book_list_etag), name="get")
 class BookList(ListView):
+    """The book table, one ``?page=`` at a time.
+
+    A page only queries its ids; every row is rendered once into an HTML
+    fragment that ``book_cache`` keeps until the book is saved or deleted.
+    """
+
     model = Book
-    context_object_name = "books"
+    template_engine = "books"
+    context_object_name = "book_ids"
+    paginate_by = settings.BOOKS_PAGE_SIZE
+    row_template_name = "my_books/book_row.html"
+
+    def get_queryset(self):
+        return Book.objects.order_by("id").values_list("id", flat=True)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["rows"] = render_rows(list(context["book_ids"]), self.row_template_name)
+
+        if context["is_paginated"]:
+            page = context["page_obj"]
+            context["page_range"] = page.paginator.get_elided_page_range(page.number)
+
+        return context
 
 
 class BookCreate(CreateView):
     model = Book
+    template_engine = "books"
     extra_context = {"is_create": True}
     success_url = reverse_lazy("book-list")
     fields = "__all__"
 
 
+@method_decorator(condition(etag_func=book_etag, last_modified_func=book_last_modified), name="get")
 class BookRead(DetailView):
     model = Book
+    template_engine = "books"
     context_object_name = "book"
 
+    def get_object(self, queryset=None):
+        queryset = self.get_queryset() if queryset is None else queryset
+        pk = self.kwargs["pk"]
+        row = book_cache.rows([pk], queryset).get(pk)
+
+        if row is None:
+            raise Http404("No book found matching the query")
+
+        return from_row(row)
+
 
 class BookUpdate(UpdateView):
     model = Book
+    template_engine = "books"
     context_object_name = "book"
     success_url = reverse_lazy("book-list")
     fields = ("pages", "language")
@@ -36,4 +96,5 @@ class BookUpdate(UpdateView):
 
 class BookDelete(DeleteView):
     model = Book
+    template_engine = "books"
     success_url = reverse_lazy("book-list")
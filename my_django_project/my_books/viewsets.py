@@ -1,13 +1,238 @@
+from functools import lru_cache
+
+from django.conf import settings
+from django.http import Http404
+
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import MultiPartParser
+from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet
 from rest_framework.permissions import AllowAny
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
+from .bulk import create_books, update_books, delete_books
+from .cache import book_cache
+from .conditional import conditional, list_etag, page_etag, row_etag
+from .filters import BookFilterBackend, StrictOrderingFilter
+from .importers import BookImporter, guess_format
 from .models import Book
-from .serializers import BookSerializer
+from .pagination import BookCursorPagination
+from .search import search_books
+from .serializers import BookSerializer, BookFastSerializer
+from .streaming import export_response
+
+
+def parse_fields(value):
+    """Parse a ``?fields=title,author`` sparse fieldset."""
+    return frozenset(filter(None, map(str.strip, value.split(","))))
+
+
+@lru_cache(maxsize=64)
+def sparse_serializer(fields):
+    return BookFastSerializer(fields)
+
+
+def positive_int(params, name, default, cutoff=None):
+    try:
+        value = int(params.get(name, default))
+    except ValueError:
+        value = 0
+
+    if value < 1:
+        raise ValidationError({name: ["A positive integer is required."]})
+
+    return min(value, cutoff) if cutoff else value
 
 
 class BookViewSet(ModelViewSet):
-    """A simple ViewSet for cruding books."""
+    """A simple ViewSet for cruding books.
+
+    Reads go through ``BookFastSerializer`` and ``book_cache``, writes through
+    ``BookSerializer``. Reads accept a ``?fields=title,author`` sparse fieldset
+    and answer conditional GETs from the ``updated_at`` validators. Lists are
+    filtered by ``BookFilterBackend`` and ordered by ``?ordering=``.
+    """
 
     queryset = Book.objects.all()
     serializer_class = BookSerializer
-    permission_classes = [AllowAny]
\ No newline at end of file
+    fast_serializer = BookFastSerializer()
+    permission_classes = [AllowAny]
+    pagination_class = BookCursorPagination
+    filter_backends = [BookFilterBackend, StrictOrderingFilter]
+    ordering_fields = ["id", "title", "author", "language"]
+    ordering = ["id"]
+
+    def get_fast_serializer(self):
+        fields = self.request.query_params.get("fields")
+
+        if not fields:
+            return self.fast_serializer
+
+        return sparse_serializer(parse_fields(fields))
+
+    def get_list_data(self):
+        serializer = self.get_fast_serializer()
+        queryset = self.filter_queryset(self.get_queryset())
+
+        # the paginator reads the cursor position from the ordering columns
+        keys = [field.lstrip("-") for field in queryset.query.order_by]
+        rows = serializer.values(queryset, "id", *keys)
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(serializer.serialize(page)).data
+
+        return serializer.serialize(rows)
+
+    def get_cached_list_data(self, key):
+        if (data := book_cache.get_list(key)) is None:
+            data = self.get_list_data()
+            book_cache.set_list(key, data)
+
+        return data
+
+    def get_list_etag(self, key):
+        """Return the etag of the list, from the page's keyset slice when paginated."""
+        queryset = self.filter_queryset(self.get_queryset())
+        variant = (key, self.request.accepted_renderer.format)
+
+        keys = [field.lstrip("-") for field in queryset.query.order_by]
+        page = self.paginate_queryset(queryset.values(*dict.fromkeys(("id", "updated_at", *keys))))
+
+        if page is None:
+            return list_etag(queryset, *variant)
+
+        return page_etag(page, self.paginator.has_next, *variant)
+
+    def list(self, request, *args, **kwargs):
+        key = request.build_absolute_uri()
+        etag = self.get_list_etag(key)
+
+        return conditional(request, lambda: Response(self.get_cached_list_data(key)), etag=etag)
+
+    def retrieve(self, request, *args, **kwargs):
+        serializer = self.get_fast_serializer()
+
+        try:
+            pk = int(self.kwargs[self.lookup_url_kwarg or self.lookup_field])
+        except ValueError:
+            raise Http404
+
+        row = book_cache.rows([pk], self.filter_queryset(self.get_queryset())).get(pk)
+
+        if row is None:
+            raise Http404
+
+        self.check_object_permissions(request, row)
+
+        return conditional(
+            request,
+            lambda: Response(serializer.to_representation(dict(row))),
+            etag=row_etag(row, request.get_full_path(), request.accepted_renderer.format),
+            last_modified=row["updated_at"],
+        )
+
+    @action(detail=False)
+    def export(self, request):
+        """Stream the whole catalogue as a JSON array, or as NDJSON with ``?ndjson=1``."""
+        queryset = self.filter_queryset(self.get_queryset())
+
+        if not queryset.ordered:
+            queryset = queryset.order_by("id")
+
+        serializer = self.get_fast_serializer()
+
+        return export_response(
+            serializer.values(queryset),
+            serializer.serialize,
+            chunk_size=settings.BOOKS_EXPORT_CHUNK_SIZE,
+            ndjson=request.query_params.get("ndjson") == "1",
+        )
+
+    @action(detail=False)
+    def search(self, request):
+        """Full-text search over titles and authors: ``?q=<words>&page=<n>&page_size=<n>``.
+
+        Results are ranked by relevance and paginated by page number.
+        """
+        params = request.query_params
+
+        if not (query := params.get("q", "").strip()):
+            raise ValidationError({"q": ["This field is required."]})
+
+        page = positive_int(params, "page", 1)
+        page_size = positive_int(params, "page_size", settings.BOOKS_PAGE_SIZE, settings.BOOKS_MAX_PAGE_SIZE)
+
+        rows, has_next = search_books(query, (page - 1) * page_size, page_size)
+        serializer = self.get_fast_serializer()
+        url = request.build_absolute_uri()
+
+        previous = None
+        if page == 2:
+            previous = remove_query_param(url, "page")
+        elif page > 2:
+            previous = replace_query_param(url, "page", page - 1)
+
+        return Response(
+            {
+                "next": replace_query_param(url, "page", page + 1) if has_next else None,
+                "previous": previous,
+                "results": [serializer.to_representation(dict(row)) for row in rows],
+            }
+        )
+
+    @action(detail=False, methods=["post", "patch", "delete"])
+    def bulk(self, request):
+        """Create (POST), update (PATCH) or delete (DELETE) a list of books in one transaction.
+
+        Invalid items are reported by index under ``errors``, the valid ones are
+        still written.
+        """
+        if not isinstance(request.data, list):
+            raise ValidationError({"non_field_errors": ["Expected a list of items."]})
+
+        if request.method == "DELETE":
+            results, errors = delete_books(request.data)
+            success_status = status.HTTP_200_OK
+        elif request.method == "PATCH":
+            books, errors = update_books(request.data)
+            results, success_status = BookSerializer(books, many=True).data, status.HTTP_200_OK
+        else:
+            books, errors = create_books(request.data)
+            results, success_status = BookSerializer(books, many=True).data, status.HTTP_201_CREATED
+
+        return Response(
+            {
+                "results": results,
+                "errors": [{"index": index, "errors": error} for index, error in errors.items()],
+            },
+            status=success_status if results or not errors else status.HTTP_400_BAD_REQUEST,
+        )
+
+    @action(detail=False, methods=["post"], url_path="import", url_name="import", parser_classes=[MultiPartParser])
+    def import_books(self, request):
+        """Upsert the books of an uploaded ``file`` (CSV or NDJSON) by title and author.
+
+        The upload is streamed in batches, so Django spools it to disk instead
+        of memory once it is large. The response counts the rows created,
+        updated, unchanged and rejected, with the first rejects by line.
+        """
+        if (upload := request.FILES.get("file")) is None:
+            raise ValidationError({"file": ["This field is required."]})
+
+        if not (format := guess_format(upload.name)):
+            raise ValidationError({"file": ["Expected a .csv, .ndjson or .jsonl file."]})
+
+        try:
+            report = BookImporter().run(upload.file, format)
+        except UnicodeDecodeError:
+            raise ValidationError({"file": ["Expected a UTF-8 encoded file."]})
+
+        written = report.created + report.updated + report.unchanged
+
+        return Response(
+            report.as_dict(),
+            status=status.HTTP_200_OK if written or not report.rejected else status.HTTP_400_BAD_REQUEST,
+        )
@@ -0,0 +1,34 @@
+"""Access to the diagnostic endpoints, ``/metrics/`` and ``/middleware/timings/``.
+
+They describe the inside of the app, and some reset what they report, so
+they do not answer the public. Without ``DIAGNOSTICS_TOKEN`` they answer only
+with ``DEBUG`` set; with it, only requests sending
+``Authorization: Bearer <DIAGNOSTICS_TOKEN>``.
+"""
+from functools import wraps
+
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import Http404
+from django.utils.crypto import constant_time_compare
+
+
+def authorized(request):
+    """Return whether ``request`` carries ``DIAGNOSTICS_TOKEN``, or ``DEBUG`` is on without one."""
+    if not settings.DIAGNOSTICS_TOKEN:
+        return settings.DEBUG
+
+    return constant_time_compare(request.headers.get("Authorization", ""), f"Bearer {settings.DIAGNOSTICS_TOKEN}")
+
+
+def require_diagnostics_access(view):
+    """Serve ``view`` only to ``authorized`` requests: 404 when no token is set, 403 without it."""
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not authorized(request):
+            raise PermissionDenied if settings.DIAGNOSTICS_TOKEN else Http404
+
+        return view(request, *args, **kwargs)
+
+    return wrapper
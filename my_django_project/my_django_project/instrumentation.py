@@ -0,0 +1,272 @@
+"""Per-request SQL, view and render timings, as ``Server-Timing`` headers and Prometheus metrics.
+
+``InstrumentationMiddleware`` measures every request: the number and total
+duration of its SQL queries (through a ``connection.execute_wrapper`` that
+reads the current request from a context variable, so queries run by the
+async views' thread pool count too), the time spent in the view and the time
+spent rendering a template or DRF response. The figures go to a
+``Server-Timing`` header when ``SERVER_TIMING`` is set, and are aggregated per
+URL name for ``GET /metrics/``. The aggregates are per process, and every
+series carries a ``pid`` label: the workers of one server share its port, so
+a scrape reaches any one of them, and without the label the counters of
+different processes would be mixed into one series that goes up and down.
+``/metrics/`` needs diagnostics access, see ``diagnostics``.
+"""
+import asyncio
+import os
+from bisect import bisect_left
+from contextvars import ContextVar
+from threading import Lock
+from time import perf_counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+
+from my_books.cache import book_cache
+
+from .diagnostics import require_diagnostics_access
+from .middleware import timing_report
+
+current = ContextVar("request_metrics", default=None)
+
+
+class RequestMetrics:
+    __slots__ = ("queries", "db", "view_start", "view", "render_start", "render")
+
+    def __init__(self):
+        self.queries = 0
+        self.db = self.view = self.render = 0.0
+        self.view_start = self.render_start = None
+
+
+def record_query(execute, sql, params, many, context):
+    if (metrics := current.get()) is None:
+        return execute(sql, params, many, context)
+
+    start = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db += perf_counter() - start
+        metrics.queries += 1
+
+
+def instrument(sender=None, connection=None, **kwargs):
+    """Add ``record_query`` to the wrappers of ``connection``, once."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+connection_created.connect(instrument)
+
+
+class Series:
+    __slots__ = ("buckets", "count", "seconds", "queries", "db", "view", "render")
+
+    def __init__(self, size):
+        self.buckets = [0] * size
+        self.count = self.queries = 0
+        self.seconds = self.db = self.view = self.render = 0.0
+
+
+class Registry:
+    """Request latency histograms and SQL/view/render totals, per URL name."""
+
+    bounds = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+    totals = (
+        ("books_db_queries_total", "SQL queries run by requests.", "queries"),
+        ("books_db_duration_seconds_total", "Time requests spent in SQL.", "db"),
+        ("books_view_duration_seconds_total", "Time requests spent in views, SQL included.", "view"),
+        ("books_render_duration_seconds_total", "Time requests spent rendering responses.", "render"),
+    )
+
+    def __init__(self):
+        self.lock = Lock()
+        self.series = {}
+
+    def observe(self, url_name, seconds, metrics):
+        with self.lock:
+            if (series := self.series.get(url_name)) is None:
+                series = self.series[url_name] = Series(len(self.bounds) + 1)
+
+            series.buckets[bisect_left(self.bounds, seconds)] += 1
+            series.count += 1
+            series.seconds += seconds
+            series.queries += metrics.queries
+            series.db += metrics.db
+            series.view += metrics.view
+            series.render += metrics.render
+
+    def clear(self):
+        with self.lock:
+            self.series.clear()
+
+    def exposition(self):
+        """Return the metrics of this process in the Prometheus text format."""
+        pid = f'pid="{os.getpid()}"'
+
+        with self.lock:
+            series = sorted(self.series.items())
+            lines = metric("books_request_duration_seconds", "histogram", "Request latency by URL name.")
+            bounds = [*map(str, self.bounds), "+Inf"]
+
+            for url_name, values in series:
+                cumulative = 0
+                for bound, count in zip(bounds, values.buckets):
+                    cumulative += count
+                    labels = f'{pid},url_name="{url_name}",le="{bound}"'
+                    lines.append(f"books_request_duration_seconds_bucket{{{labels}}} {cumulative}")
+
+                lines.append(f'books_request_duration_seconds_sum{{{pid},url_name="{url_name}"}} {values.seconds}')
+                lines.append(f'books_request_duration_seconds_count{{{pid},url_name="{url_name}"}} {values.count}')
+
+            for name, help, attribute in self.totals:
+                samples = [(f'{pid},url_name="{url_name}"', getattr(values, attribute)) for url_name, values in series]
+                lines += metric(name, "counter", help, samples)
+
+        stats = book_cache.stats()
+        lines += metric(
+            "books_cache_lookups_total",
+            "counter",
+            "book_cache lookups by result.",
+            [
+                (f'{pid},result="local_hit"', stats["local_hits"]),
+                (f'{pid},result="shared_hit"', stats["shared_hits"]),
+                (f'{pid},result="miss"', stats["misses"]),
+            ],
+        )
+
+        if settings.MIDDLEWARE_TIMING:
+            lines += metric(
+                "books_middleware_duration_seconds_total",
+                "counter",
+                "Time spent in each middleware layer, the layers below excluded.",
+                [
+                    (f'{pid},stack="{stack}",layer="{row["layer"]}"', row["total_ms"] / 1000)
+                    for stack, rows in timing_report().items()
+                    for row in rows
+                ],
+            )
+
+        return "\n".join(lines) + "\n"
+
+
+def metric(name, kind, help, samples=()):
+    """Return the exposition lines of one metric: its ``HELP`` and ``TYPE``, then ``samples``."""
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+    return lines + [f"{name}{{{labels}}} {value}" for labels, value in samples]
+
+
+registry = Registry()
+
+
+def server_timing(metrics, total):
+    return (
+        f'db;dur={metrics.db * 1000:.2f};desc="{metrics.queries} queries", '
+        f"view;dur={metrics.view * 1000:.2f}, "
+        f"render;dur={metrics.render * 1000:.2f}, "
+        f"total;dur={total * 1000:.2f}"
+    )
+
+
+class InstrumentationMiddleware:
+    """Measure every request, see the module docstring.
+
+    It should come first in ``MIDDLEWARE`` so that ``total`` covers the other
+    middleware. ``db`` is part of ``view``, which ends when the view returns.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.INSTRUMENTATION:
+            raise MiddlewareNotUsed
+
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+
+        if self.is_async:
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+            self.process_view = self.process_view_async
+            self.process_template_response = self.process_template_response_async
+
+    def start(self):
+        # connections opened before this module was imported missed the signal
+        for connection in connections.all():
+            instrument(connection=connection)
+
+        metrics = RequestMetrics()
+        return metrics, current.set(metrics), perf_counter()
+
+    def finish(self, request, response, metrics, start):
+        end = perf_counter()
+
+        if metrics.view_start is not None and not metrics.view:
+            metrics.view = end - metrics.view_start
+
+        match = request.resolver_match
+        registry.observe((match.url_name or match.route) if match else "unmatched", end - start, metrics)
+
+        if settings.SERVER_TIMING:
+            response["Server-Timing"] = server_timing(metrics, end - start)
+
+        return response
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        metrics, token, start = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            current.reset(token)
+
+        return self.finish(request, response, metrics, start)
+
+    async def __acall__(self, request):
+        metrics, token, start = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current.reset(token)
+
+        return self.finish(request, response, metrics, start)
+
+    def view_started(self):
+        if (metrics := current.get()) is not None:
+            metrics.view_start = perf_counter()
+
+    def view_returned(self, response):
+        if (metrics := current.get()) is None or metrics.view_start is None:
+            return response
+
+        metrics.render_start = perf_counter()
+        metrics.view = metrics.render_start - metrics.view_start
+
+        def rendered(response):
+            metrics.render = perf_counter() - metrics.render_start
+
+        response.add_post_render_callback(rendered)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        self.view_started()
+
+    async def process_view_async(self, request, view_func, view_args, view_kwargs):
+        self.view_started()
+
+    def process_template_response(self, request, response):
+        return self.view_returned(response)
+
+    async def process_template_response_async(self, request, response):
+        return self.view_returned(response)
+
+
+@require_diagnostics_access
+def metrics_view(request):
+    return HttpResponse(registry.exposition(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,219 @@
+"""Middleware stacks chosen by URL prefix, with an optional per-layer timing report.
+
+``MIDDLEWARE`` holds only ``RoutedMiddleware``. It builds every stack of
+``MIDDLEWARE_STACKS`` the way Django builds ``MIDDLEWARE``, and sends each
+request down the stack of the first ``MIDDLEWARE_ROUTES`` prefix that matches
+its path. The view, template response and exception hooks of the chosen stack
+run as they would at the top level.
+
+With ``MIDDLEWARE_TIMING`` set, every layer records how long it spends on a
+request excluding the layers below it, see ``timing_report``.
+"""
+import asyncio
+from threading import Lock
+from time import perf_counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.handlers.base import BaseHandler
+from django.core.handlers.exception import convert_exception_to_response
+from django.http import JsonResponse
+from django.utils.module_loading import import_string
+from django.views.decorators.http import require_http_methods
+
+from .diagnostics import require_diagnostics_access
+
+VIEW = "view"
+
+
+class Timings:
+    """Thread-safe ``(calls, seconds)`` totals, keyed by ``(stack, layer)``."""
+
+    def __init__(self):
+        self.lock = Lock()
+        self.totals = {}
+
+    def add(self, key, seconds):
+        with self.lock:
+            calls, total = self.totals.get(key, (0, 0.0))
+            self.totals[key] = (calls + 1, total + seconds)
+
+    def clear(self):
+        with self.lock:
+            self.totals.clear()
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.totals)
+
+
+timings = Timings()
+
+
+def timed(handler, key, is_async):
+    """Wrap ``handler`` to add the time of every call, including what it calls, to ``key``."""
+    if is_async:
+
+        async def call(request):
+            start = perf_counter()
+            try:
+                return await handler(request)
+            finally:
+                timings.add(key, perf_counter() - start)
+
+    else:
+
+        def call(request):
+            start = perf_counter()
+            try:
+                return handler(request)
+            finally:
+                timings.add(key, perf_counter() - start)
+
+    return call
+
+
+class MiddlewareStack:
+    """One chain of ``paths`` around ``get_response``, built like ``BaseHandler.load_middleware``."""
+
+    def __init__(self, name, paths, get_response, is_async, timing=False):
+        adapt = BaseHandler().adapt_method_mode
+
+        self.name = name
+        self.view_middleware = []
+        self.template_response_middleware = []
+        self.exception_middleware = []
+
+        handler = convert_exception_to_response(get_response)
+        handler_is_async = is_async
+
+        if timing:
+            handler = timed(handler, (name, VIEW), handler_is_async)
+
+        for path in reversed(paths):
+            middleware = import_string(path)
+
+            if not handler_is_async and getattr(middleware, "sync_capable", True):
+                middleware_is_async = False
+            else:
+                middleware_is_async = getattr(middleware, "async_capable", False)
+
+            adapted = adapt(middleware_is_async, handler, handler_is_async)
+
+            try:
+                instance = middleware(adapted)
+            except MiddlewareNotUsed:
+                continue
+
+            if hasattr(instance, "process_view"):
+                self.view_middleware.insert(0, adapt(is_async, instance.process_view))
+            if hasattr(instance, "process_template_response"):
+                self.template_response_middleware.append(adapt(is_async, instance.process_template_response))
+            if hasattr(instance, "process_exception"):
+                # like Django, exception hooks always run synchronously
+                self.exception_middleware.append(adapt(False, instance.process_exception))
+
+            handler = convert_exception_to_response(instance)
+            handler_is_async = middleware_is_async
+
+            if timing:
+                handler = timed(handler, (name, path), handler_is_async)
+
+        self.chain = adapt(is_async, handler, handler_is_async)
+
+
+class RoutedMiddleware:
+    """Run the middleware stack that ``MIDDLEWARE_ROUTES`` picks for the request path."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        self.routes = settings.MIDDLEWARE_ROUTES
+        self.stacks = {
+            name: MiddlewareStack(name, paths, get_response, self.is_async, settings.MIDDLEWARE_TIMING)
+            for name, paths in settings.MIDDLEWARE_STACKS.items()
+        }
+
+        if self.is_async:
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+            self.process_view = self.process_view_async
+            self.process_template_response = self.process_template_response_async
+
+    def stack(self, request):
+        for prefix, name in self.routes:
+            if request.path_info.startswith(prefix):
+                return self.stacks[name]
+
+        raise LookupError(f"No middleware stack routes {request.path_info}")
+
+    def __call__(self, request):
+        return self.stack(request).chain(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        for method in self.stack(request).view_middleware:
+            if response := method(request, view_func, view_args, view_kwargs):
+                return response
+
+    async def process_view_async(self, request, view_func, view_args, view_kwargs):
+        for method in self.stack(request).view_middleware:
+            if response := await method(request, view_func, view_args, view_kwargs):
+                return response
+
+    def process_template_response(self, request, response):
+        for method in self.stack(request).template_response_middleware:
+            response = method(request, response)
+
+        return response
+
+    async def process_template_response_async(self, request, response):
+        for method in self.stack(request).template_response_middleware:
+            response = await method(request, response)
+
+        return response
+
+    def process_exception(self, request, exception):
+        for method in self.stack(request).exception_middleware:
+            if response := method(request, exception):
+                return response
+
+
+def timing_report():
+    """Return, per stack, the calls and mean milliseconds of every layer, view included.
+
+    A layer's time excludes the layers below it. The totals are per process.
+    """
+    totals = timings.snapshot()
+    report = {}
+
+    for name, paths in settings.MIDDLEWARE_STACKS.items():
+        layers = [*[path for path in paths if (name, path) in totals], VIEW]
+        rows = []
+
+        for layer, below in zip(layers, [*layers[1:], None]):
+            calls, seconds = totals.get((name, layer), (0, 0.0))
+            inner = totals.get((name, below), (0, 0.0))[1] if below else 0.0
+
+            rows.append(
+                {
+                    "layer": layer,
+                    "calls": calls,
+                    "total_ms": (seconds - inner) * 1000,
+                    "mean_ms": (seconds - inner) * 1000 / calls if calls else 0.0,
+                }
+            )
+
+        report[name] = rows
+
+    return report
+
+
+@require_http_methods(["GET", "DELETE"])
+@require_diagnostics_access
+def timing_report_view(request):
+    """``GET`` the timing report of this process; ``DELETE`` resets it. Both need diagnostics access."""
+    if request.method == "DELETE":
+        timings.clear()
+
+    return JsonResponse(timing_report())
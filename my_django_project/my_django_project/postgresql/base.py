@@ -0,0 +1,158 @@
+"""PostgreSQL backend with connection health checks and an optional in-process pool.
+
+Extra ``DATABASES`` keys:
+
+* ``CONN_HEALTH_CHECKS``: before the first query of a request, ping a reused
+  connection and reconnect if the server dropped it. With ``POOL``, every
+  connection checked out of the pool is pinged instead, and replaced if the
+  server dropped it while it sat idle.
+* ``POOL``: ``{"MIN_SIZE": <n>, "MAX_SIZE": <n>, "TIMEOUT": <seconds>}``
+  keeps up to ``MAX_SIZE`` connections per process in a ``BlockingPool``;
+  closing a connection returns it to the pool. A thread that finds every
+  connection taken waits up to ``TIMEOUT`` seconds for one. Every thread holds
+  at most one connection, so with ``MAX_SIZE`` at least the threads of one
+  worker (uwsgi ``--threads``, ``BOOKS_ASYNC_DB_WORKERS``) nothing ever waits.
+"""
+import threading
+
+import psycopg2.extras
+from psycopg2.pool import PoolError, ThreadedConnectionPool
+
+from django.db.backends.postgresql import base
+
+
+class BlockingPool(ThreadedConnectionPool):
+    """``ThreadedConnectionPool`` whose ``getconn`` waits for a free connection.
+
+    The parent raises ``PoolError`` as soon as ``maxconn`` connections are
+    out; here a checkout waits up to ``timeout`` seconds for a ``putconn``.
+    """
+
+    def __init__(self, minconn, maxconn, timeout, *args, **kwargs):
+        super().__init__(minconn, maxconn, *args, **kwargs)
+        self.timeout = timeout
+        self.slots = threading.BoundedSemaphore(maxconn)
+
+    def getconn(self, key=None):
+        if not self.slots.acquire(timeout=self.timeout):
+            raise PoolError(f"no connection was returned to the pool within {self.timeout} seconds")
+
+        try:
+            return super().getconn(key)
+        except BaseException:
+            self.slots.release()
+            raise
+
+    def putconn(self, conn=None, key=None, close=False):
+        try:
+            super().putconn(conn, key, close)
+        finally:
+            self.slots.release()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    pools = {}
+    pools_lock = threading.Lock()
+
+    health_check_done = False
+
+    @property
+    def pool_settings(self):
+        return self.settings_dict.get("POOL")
+
+    def get_pool(self, conn_params):
+        with self.pools_lock:
+            if (pool := self.pools.get(self.alias)) is None:
+                pool = self.pools[self.alias] = BlockingPool(
+                    self.pool_settings.get("MIN_SIZE", 1),
+                    self.pool_settings["MAX_SIZE"],
+                    self.pool_settings.get("TIMEOUT", 30),
+                    **conn_params,
+                )
+
+        return pool
+
+    def get_new_connection(self, conn_params):
+        if not self.pool_settings:
+            return super().get_new_connection(conn_params)
+
+        pool = self.get_pool(conn_params)
+        connection = pool.getconn()
+
+        # dead connections are closed as they are found, so once every idle
+        # one was tried the pool opens a fresh connection
+        for _ in range(self.pool_settings["MAX_SIZE"]):
+            if self.is_alive(connection):
+                break
+
+            pool.putconn(connection, close=True)
+            connection = pool.getconn()
+
+        try:
+            # what the parent does with a fresh psycopg2 connection
+            options = self.settings_dict["OPTIONS"]
+            self.isolation_level = options.get("isolation_level", connection.isolation_level)
+
+            if connection.isolation_level != self.isolation_level:
+                connection.set_session(isolation_level=self.isolation_level)
+
+            psycopg2.extras.register_default_jsonb(conn_or_curs=connection, loads=lambda x: x)
+        except BaseException:
+            # Django never saw this connection, so it would never return it
+            pool.putconn(connection, close=True)
+            raise
+
+        return connection
+
+    def is_alive(self, connection):
+        """Return whether a connection checked out of the pool can still run queries."""
+        if connection.closed:
+            return False
+
+        # the socket of a connection the server dropped only fails when used
+        if not self.settings_dict.get("CONN_HEALTH_CHECKS"):
+            return True
+
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+
+            if not connection.autocommit:
+                connection.rollback()
+        except psycopg2.Error:
+            return False
+
+        return True
+
+    def _close(self):
+        if self.connection is None or not self.pool_settings:
+            return super()._close()
+
+        with self.wrap_database_errors:
+            # a connection that failed goes away instead of back to the pool
+            broken = self.errors_occurred or self.connection.closed
+            self.pools[self.alias].putconn(self.connection, close=broken)
+
+    def connect(self):
+        super().connect()
+        # a fresh connection, or one get_new_connection just checked
+        self.health_check_done = True
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()
+        self.health_check_done = False
+
+    def close_if_health_check_failed(self):
+        enabled = self.settings_dict.get("CONN_HEALTH_CHECKS")
+
+        if self.connection is None or self.health_check_done or not enabled:
+            return
+
+        if not self.is_usable():
+            self.close()
+
+        self.health_check_done = True
+
+    def _cursor(self, name=None):
+        self.close_if_health_check_failed()
+        return super()._cursor(name)
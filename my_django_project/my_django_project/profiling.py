@@ -0,0 +1,150 @@
+"""Opt-in cProfile captures of sampled or signed requests, written as pstats files.
+
+With ``PROFILING`` set, ``ProfilingMiddleware`` profiles a
+``PROFILING_SAMPLE_RATE`` fraction of requests, and every request whose
+``PROFILING_HEADER`` carries a token printed by ``manage.py profile_token``.
+Each capture covers URL resolution, the view and the rendering of its
+response, and is dumped to
+``PROFILING_DIR/<url_name>.<time_ns>.<pid>.<thread>.prof``, a pstats file
+that ``pstats.Stats`` merges by glob and flame graph tools read.
+
+Files are written under a temporary name and renamed into place, so uwsgi
+processes and threads never collide or expose half-written profiles. After
+each write the oldest profiles beyond ``PROFILING_MAX_FILES`` are deleted, so
+sampling or a leaked token cannot fill the disk. cProfile
+follows a single thread, so in async mode a capture also counts the other
+requests the event loop runs meanwhile, and only one runs at a time per loop.
+"""
+import asyncio
+import cProfile
+import os
+import random
+import re
+import threading
+from pathlib import Path
+from time import time_ns
+
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import MiddlewareNotUsed
+
+signer = signing.TimestampSigner(salt="my_django_project.profiling")
+active = threading.local()
+
+
+def profile_token():
+    """Return a ``PROFILING_HEADER`` value that profiles the request, for ``PROFILING_TOKEN_MAX_AGE`` seconds."""
+    return signer.sign("profile")
+
+
+def signed(request):
+    if not (token := request.headers.get(settings.PROFILING_HEADER)):
+        return False
+
+    try:
+        return signer.unsign(token, max_age=settings.PROFILING_TOKEN_MAX_AGE) == "profile"
+    except signing.BadSignature:
+        return False
+
+
+def dump(profile, request):
+    """Write ``profile`` to ``PROFILING_DIR`` atomically, tagged with the URL name, and return the file name."""
+    match = request.resolver_match
+    tag = re.sub(r"[^\w-]+", "_", (match.url_name or match.route) if match else "unmatched").strip("_")
+
+    directory = Path(settings.PROFILING_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    name = f"{tag or 'root'}.{time_ns()}.{os.getpid()}.{threading.get_ident()}.prof"
+    temporary = directory / f".{name}.tmp"
+
+    profile.dump_stats(temporary)
+    os.replace(temporary, directory / name)
+    prune(directory, settings.PROFILING_MAX_FILES)
+    return name
+
+
+def prune(directory, max_files):
+    """Delete the oldest profiles in ``directory`` beyond the ``max_files`` newest."""
+    profiles = []
+
+    for path in directory.glob("*.prof"):
+        try:
+            profiles.append((path.stat().st_mtime_ns, path.name, path))
+        except FileNotFoundError:
+            continue
+
+    # other processes prune the same directory, and may get there first
+    for *_, path in sorted(profiles)[:-max_files or None]:
+        path.unlink(missing_ok=True)
+
+
+class ProfilingMiddleware:
+    """Profile sampled and signed requests, see the module docstring.
+
+    It should come last in ``MIDDLEWARE`` so that captures leave the other
+    middleware out. Signed requests get the file name back in ``PROFILING_HEADER``.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PROFILING:
+            raise MiddlewareNotUsed
+
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+
+        if self.is_async:
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def start(self, request):
+        """Return a running profiler and whether the request was signed, or ``None`` to skip it."""
+        if getattr(active, "profile", None) is not None:
+            return None
+
+        is_signed = signed(request)
+        if not is_signed and random.random() >= settings.PROFILING_SAMPLE_RATE:
+            return None
+
+        active.profile = cProfile.Profile()
+        active.profile.enable()
+        return active.profile, is_signed
+
+    def finish(self, request, response, profile, is_signed):
+        name = dump(profile, request)
+
+        if is_signed:
+            response[settings.PROFILING_HEADER] = name
+
+        return response
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        if (capture := self.start(request)) is None:
+            return self.get_response(request)
+
+        profile, is_signed = capture
+        try:
+            response = self.get_response(request)
+        finally:
+            profile.disable()
+            active.profile = None
+
+        return self.finish(request, response, profile, is_signed)
+
+    async def __acall__(self, request):
+        if (capture := self.start(request)) is None:
+            return await self.get_response(request)
+
+        profile, is_signed = capture
+        try:
+            response = await self.get_response(request)
+        finally:
+            profile.disable()
+            active.profile = None
+
+        return self.finish(request, response, profile, is_signed)
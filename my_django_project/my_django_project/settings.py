@@ -4,6 +4,7 @@ Django settings for my_django_project project.
 """
 
 import os
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 from decouple import config
@@ -37,29 +38,108 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
-    "django.middleware.security.SecurityMiddleware",
-    "django.contrib.sessions.middleware.SessionMiddleware",
-    "django.middleware.common.CommonMiddleware",
-    "django.middleware.csrf.CsrfViewMiddleware",
-    "django.contrib.auth.middleware.AuthenticationMiddleware",
-    "django.contrib.messages.middleware.MessageMiddleware",
-    "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    # SQL, view and render timings, see my_django_project/instrumentation.py
+    "my_django_project.instrumentation.InstrumentationMiddleware",
+    # runs one of MIDDLEWARE_STACKS, see my_django_project/middleware.py
+    "my_django_project.middleware.RoutedMiddleware",
+    # cProfile captures of sampled or signed requests, see my_django_project/profiling.py
+    "my_django_project.profiling.ProfilingMiddleware",
 ]
 
+MIDDLEWARE_STACKS = {
+    "full": [
+        "django.middleware.security.SecurityMiddleware",
+        "django.contrib.sessions.middleware.SessionMiddleware",
+        "django.middleware.common.CommonMiddleware",
+        "django.middleware.csrf.CsrfViewMiddleware",
+        "django.contrib.auth.middleware.AuthenticationMiddleware",
+        "django.contrib.messages.middleware.MessageMiddleware",
+        "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    ],
+    # the APIs use no session, so they have no ambient credentials for CSRF to protect
+    "api": [
+        "django.middleware.security.SecurityMiddleware",
+        "django.middleware.common.CommonMiddleware",
+    ],
+}
+
+# (path prefix, stack): the first matching prefix wins
+MIDDLEWARE_ROUTES = [
+    ("/books/api/", "api"),
+    ("/books/async/api/", "api"),
+    ("/graphql/", "api"),
+    ("/middleware/", "api"),
+    ("/metrics/", "api"),
+    ("", "full"),
+]
+
+# time every middleware layer, reported at /middleware/timings/
+MIDDLEWARE_TIMING = config("MIDDLEWARE_TIMING", default=False, cast=bool)
+
+# /metrics/ and /middleware/timings/ answer only with DEBUG, or with this
+# set, only to requests sending "Authorization: Bearer <DIAGNOSTICS_TOKEN>"
+DIAGNOSTICS_TOKEN = config("DIAGNOSTICS_TOKEN", default="")
+
+# per-request metrics at /metrics/, and Server-Timing response headers
+INSTRUMENTATION = config("INSTRUMENTATION", default=True, cast=bool)
+SERVER_TIMING = config("SERVER_TIMING", default=True, cast=bool)
+
+# profile a fraction of requests, and those with a signed header, into PROFILING_DIR
+PROFILING = config("PROFILING", default=False, cast=bool)
+PROFILING_SAMPLE_RATE = config("PROFILING_SAMPLE_RATE", default=0.0, cast=float)
+PROFILING_HEADER = config("PROFILING_HEADER", default="X-Profile")
+PROFILING_TOKEN_MAX_AGE = config("PROFILING_TOKEN_MAX_AGE", default=3600, cast=int)
+PROFILING_DIR = config("PROFILING_DIR", default=os.path.join(tempfile.gettempdir(), "my_django_project-profiles"))
+# the oldest profiles beyond this many are deleted after each write
+PROFILING_MAX_FILES = config("PROFILING_MAX_FILES", default=500, cast=int)
+
+# the admin looks for its middleware in MIDDLEWARE, the full stack has them
+SILENCED_SYSTEM_CHECKS = ["admin.E408", "admin.E409", "admin.E410"]
+
 ROOT_URLCONF = "my_django_project.urls"
 
+# "production" keeps compiled templates cached and drops the context
+# processors the book templates do not use; it is the default unless DEBUG
+TEMPLATE_PROFILE = config("TEMPLATE_PROFILE", default="development" if DEBUG else "production")
+# compile every book template when a worker starts, see wsgi.py and asgi.py
+TEMPLATE_PREWARM = config("TEMPLATE_PREWARM", default=TEMPLATE_PROFILE == "production", cast=bool)
+
+TEMPLATE_LOADERS = [
+    "django.template.loaders.filesystem.Loader",
+    "django.template.loaders.app_directories.Loader",
+]
+TEMPLATE_CONTEXT_PROCESSORS = [
+    "django.template.context_processors.debug",
+    "django.template.context_processors.request",
+    "django.contrib.auth.context_processors.auth",
+    "django.contrib.messages.context_processors.messages",
+]
+BOOKS_TEMPLATE_CONTEXT_PROCESSORS = TEMPLATE_CONTEXT_PROCESSORS
+
+if TEMPLATE_PROFILE == "production":
+    TEMPLATE_LOADERS = [("django.template.loaders.cached.Loader", TEMPLATE_LOADERS)]
+    # the admin still needs request, auth and messages
+    TEMPLATE_CONTEXT_PROCESSORS = TEMPLATE_CONTEXT_PROCESSORS[1:]
+    # csrf_token is always available, and it is all the book templates use
+    BOOKS_TEMPLATE_CONTEXT_PROCESSORS = []
+
 TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
         "DIRS": [],
-        "APP_DIRS": True,
         "OPTIONS": {
-            "context_processors": [
-                "django.template.context_processors.debug",
-                "django.template.context_processors.request",
-                "django.contrib.auth.context_processors.auth",
-                "django.contrib.messages.context_processors.messages",
-            ],
+            "context_processors": TEMPLATE_CONTEXT_PROCESSORS,
+            "loaders": TEMPLATE_LOADERS,
+        },
+    },
+    {
+        # used by the my_books views
+        "NAME": "books",
+        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "DIRS": [os.path.join(BASE_DIR, "my_books", "templates")],
+        "OPTIONS": {
+            "context_processors": BOOKS_TEMPLATE_CONTEXT_PROCESSORS,
+            "loaders": TEMPLATE_LOADERS,
         },
     },
 ]
@@ -71,16 +151,31 @@ WSGI_APPLICATION = "my_django_project.wsgi.application"
 # https://docs.djangoproject.com/en/3.0/ref/settings/#databases
 
 if config("PRODUCTION", default=False, cast=bool):
+    # a pooled connection goes back to the pool after each request, a
+    # persistent one is kept by its thread for CONN_MAX_AGE seconds
+    DB_POOL = config("DB_POOL", default=False, cast=bool)
+
     DATABASES = {
         "default": {
-            "ENGINE": "django.db.backends.postgresql",
+            # django.db.backends.postgresql plus health checks and an optional pool
+            "ENGINE": "my_django_project.postgresql",
             "HOST": config("DB_HOST"),
             "PORT": config("DB_PORT"),
             "NAME": config("DB_NAME"),
             "USER": config("DB_USER"),
             "PASSWORD": config("DB_PASSWORD"),
+            "CONN_MAX_AGE": config("DB_CONN_MAX_AGE", default=0 if DB_POOL else 60, cast=int),
+            "CONN_HEALTH_CHECKS": config("DB_CONN_HEALTH_CHECKS", default=True, cast=bool),
         }
     }
+
+    if DB_POOL:
+        DATABASES["default"]["POOL"] = {
+            "MIN_SIZE": config("DB_POOL_MIN_SIZE", default=1, cast=int),
+            "MAX_SIZE": config("DB_POOL_MAX_SIZE", default=4, cast=int),
+            # seconds a thread waits for a connection when MAX_SIZE are out
+            "TIMEOUT": config("DB_POOL_TIMEOUT", default=30, cast=float),
+        }
 else:
     DATABASES = {
         "default": {
@@ -88,3 +183,43 @@ else:
             "NAME": os.path.join(BASE_DIR, "db.sqlite3"),
         }
     }
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.0/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": config(
+            "CACHE_BACKEND", default="django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": config("CACHE_LOCATION", default=""),
+    }
+}
+
+
+# Books
+
+BOOKS_PAGE_SIZE = config("BOOKS_PAGE_SIZE", default=100, cast=int)
+BOOKS_MAX_PAGE_SIZE = config("BOOKS_MAX_PAGE_SIZE", default=1000, cast=int)
+BOOKS_EXPORT_CHUNK_SIZE = config("BOOKS_EXPORT_CHUNK_SIZE", default=2000, cast=int)
+BOOKS_BULK_BATCH_SIZE = config("BOOKS_BULK_BATCH_SIZE", default=500, cast=int)
+BOOKS_IMPORT_MAX_REJECTS = config("BOOKS_IMPORT_MAX_REJECTS", default=100, cast=int)
+BOOKS_ASYNC_DB_WORKERS = config("BOOKS_ASYNC_DB_WORKERS", default=8, cast=int)
+
+BOOKS_CACHE_ALIAS = config("BOOKS_CACHE_ALIAS", default="default")
+# invalidations only reach the processes sharing the cache, so caching books
+# with a per-process backend is only correct with a single worker: opt in
+BOOKS_CACHE_ENABLED = config(
+    "BOOKS_CACHE_ENABLED",
+    default=CACHES[BOOKS_CACHE_ALIAS]["BACKEND"]
+    not in ["django.core.cache.backends.locmem.LocMemCache", "django.core.cache.backends.dummy.DummyCache"],
+    cast=bool,
+)
+BOOKS_CACHE_TIMEOUT = config("BOOKS_CACHE_TIMEOUT", default=300, cast=int)
+BOOKS_CACHE_LOCAL_SIZE = config("BOOKS_CACHE_LOCAL_SIZE", default=1024, cast=int)
+BOOKS_CACHE_LOCAL_TIMEOUT = config("BOOKS_CACHE_LOCAL_TIMEOUT", default=5, cast=int)
+
+GRAPHQL_DOCUMENT_CACHE_SIZE = config("GRAPHQL_DOCUMENT_CACHE_SIZE", default=256, cast=int)
+# persisted queries live in the default cache, so per process with LocMemCache
+GRAPHQL_PERSISTED_QUERY_TIMEOUT = config("GRAPHQL_PERSISTED_QUERY_TIMEOUT", default=86400, cast=int)
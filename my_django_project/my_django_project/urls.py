@@ -13,14 +13,21 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 
-from graphene_django.views import GraphQLView
+from my_django_project.instrumentation import metrics_view
+from my_django_project.middleware import timing_report_view
+from my_books.graphql_views import PersistedQueryView
 from my_books.schema import schema
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("", include("my_books.urls")),
-    path("graphql/", GraphQLView.as_view(graphiql=True, schema=schema)),
+    path("graphql/", PersistedQueryView.as_view(graphiql=True, schema=schema), name="graphql"),
+    path("metrics/", metrics_view, name="metrics"),
 ]
+
+if settings.MIDDLEWARE_TIMING:
+    urlpatterns.append(path("middleware/timings/", timing_report_view, name="middleware-timings"))